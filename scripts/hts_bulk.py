@@ -0,0 +1,127 @@
+"""Shared bulk-write helpers for the aes_hts_codes loaders.
+
+Used by seed_aes_hts.py and import_hts_data.py. Rows are written in
+execute_values batches, each inside a savepoint. A batch that fails is rolled
+back to its savepoint and retried row by row, so one bad row only costs
+itself: every other row still lands, and the bad one goes to the rejects file
+with the database's reason.
+"""
+import csv
+import json
+import hashlib
+from itertools import islice
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+# Same pattern as the hts_code_format_check constraint on aes_hts_codes
+HTS_CODE_PATTERN = r'^[0-9]{4}(\.[0-9]{2}){0,3}$'
+
+
+def error_reason(e):
+    """One-line reason for a database error, e.g. '22001: value too long ...'."""
+    diag = getattr(e, 'diag', None)
+    message = (diag and diag.message_primary) or str(e).strip().splitlines()[0]
+    return f"{e.pgcode}: {message}" if getattr(e, 'pgcode', None) else message
+
+
+class Rejects:
+    """CSV of rows that were not written: line, hts_code, reason, data.
+
+    Rows are written as they are added, so a large reject set is never held
+    in memory. `counts` tallies rejects by reason.
+    """
+
+    FIELDS = ('line', 'hts_code', 'reason', 'data')
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.counts = {}
+        self._file = open(path, 'w', newline='', encoding='utf-8') if path else None
+        self._writer = csv.writer(self._file) if self._file else None
+        if self._writer:
+            self._writer.writerow(self.FIELDS)
+
+    def add(self, line, hts_code, reason, data=None):
+        self.count += 1
+        self.counts[reason] = self.counts.get(reason, 0) + 1
+        if self._writer:
+            if not isinstance(data, str) and data is not None:
+                data = json.dumps(data, default=str)
+            self._writer.writerow((line, hts_code, reason, data))
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def content_hash(values):
+    """md5 of `values` as text; equals hash_sql() over the same stored columns."""
+    text = '\x1f'.join('\x1e' if v is None else str(v) for v in values)
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+def hash_sql(columns):
+    """SQL expression hashing `columns` the way content_hash() does."""
+    parts = ', '.join(f"coalesce({c}::text, chr(30))" for c in columns)
+    return f"md5(concat_ws(chr(31), {parts}))"
+
+
+def fetch_hashes(cur, columns):
+    """{hts_code: content hash of `columns`} for every row in aes_hts_codes, in one query."""
+    cur.execute(f"SELECT hts_code, {hash_sql(columns)} FROM public.aes_hts_codes")
+    return dict(cur.fetchall())
+
+
+def batched(iterable, size):
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def write_batches(cur, sql, rows, columns, rejects, page_size=1000):
+    """Upsert `rows` with execute_values, isolating failures with savepoints.
+
+    `sql` is an INSERT ... VALUES %s ... RETURNING (xmax = 0) statement;
+    `rows` yields (line, values) pairs where values is a tuple in `columns`
+    order. A failing batch is rolled back to its savepoint and replayed one
+    row at a time, and only the rows that still fail are passed to
+    `rejects`. Returns (inserted, updated). Must run inside a transaction.
+    """
+    inserted = updated = 0
+    hts_index = columns.index('hts_code')
+    for batch in batched(rows, page_size):
+        cur.execute("SAVEPOINT hts_batch")
+        try:
+            flags = execute_values(cur, sql, [values for _, values in batch], page_size=len(batch), fetch=True)
+            cur.execute("RELEASE SAVEPOINT hts_batch")
+        except psycopg2.Error:
+            cur.execute("ROLLBACK TO SAVEPOINT hts_batch")
+            flags = []
+            for line, values in batch:
+                cur.execute("SAVEPOINT hts_row")
+                try:
+                    flags.extend(execute_values(cur, sql, [values], fetch=True))
+                    cur.execute("RELEASE SAVEPOINT hts_row")
+                except psycopg2.Error as e:
+                    cur.execute("ROLLBACK TO SAVEPOINT hts_row")
+                    cur.execute("RELEASE SAVEPOINT hts_row")
+                    rejects.add(line, values[hts_index], error_reason(e), dict(zip(columns, values)))
+            cur.execute("RELEASE SAVEPOINT hts_batch")
+        for (was_inserted,) in flags:
+            if was_inserted:
+                inserted += 1
+            else:
+                updated += 1
+    return inserted, updated
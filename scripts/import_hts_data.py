@@ -4,7 +4,7 @@ import os
 import json
 import psycopg2
 from dotenv import load_dotenv
-import re
+from hts_bulk import HTS_CODE_PATTERN, Rejects, content_hash, fetch_hashes, write_batches
 
 load_dotenv()
 
@@ -12,29 +12,78 @@ def get_db_connection():
     db_url = os.environ.get("DIRECT_URL") or os.environ.get("DATABASE_URL")
     return psycopg2.connect(db_url)
 
-def validate_hts_format(code):
-    # Regex from DB constraint: ^[0-9]{4}(\.[0-9]{2}){0,3}$
-    pattern = r'^[0-9]{4}(\.[0-9]{2}){0,3}$'
-    return re.match(pattern, str(code)) is not None
+UPSERT_COLUMNS = (
+    'hts_code', 'description', 'category', 'unit_of_measure',
+    'duty_rate', 'schedule_b', 'special_provisions',
+    'sub_category', 'sub_sub_category', 'uom1', 'uom2',
+)
+# Columns an existing code takes from the file; the rest keep their values
+UPDATE_COLUMNS = ('description', 'category', 'unit_of_measure', 'duty_rate', 'schedule_b', 'special_provisions')
 
-def clean_hts_code(code):
-    # Try to format raw digits to HTS format if possible, or return as is
-    # This is a helper, but strictly we should expect valid input or reject
-    code = str(code).strip()
-    # If it's just digits, we might want to format it? 
-    # For now, let's assume input should be relatively clean or we validate strict
-    return code
+def clean_hts_codes(codes):
+    # Codes are read as text, so leading zeros survive; just trim whitespace.
+    # Stricter reformatting would hide bad input, so invalid codes are rejected
+    return codes.astype('string').str.strip()
 
-def import_data(file_path, dry_run=False):
+def valid_hts_codes(codes):
+    # Same pattern as the DB constraint: ^[0-9]{4}(\.[0-9]{2}){0,3}$
+    return codes.str.fullmatch(HTS_CODE_PATTERN).fillna(False).astype(bool)
+
+def without_na(df):
+    """Object-dtype copy of `df` with every NA (NaN, NaT, pd.NA) as None."""
+    return df.astype(object).where(df.notna(), None)
+
+def latest_rows(df):
+    """(pos, values) rows in UPSERT_COLUMNS order, one per code, plus the
+    number of duplicate rows dropped.
+
+    A code listed twice keeps its last row, as a row-by-row upsert would;
+    ON CONFLICT cannot update the same code twice in one batch. Missing
+    optional columns become NULL.
+    """
+    latest = df.drop_duplicates('hts_code', keep='last')
+    values = without_na(latest.reindex(columns=list(UPSERT_COLUMNS)))
+    rows = list(zip(values.index.tolist(), values.itertuples(index=False, name=None)))
+    return rows, len(df) - len(latest)
+
+def changed_rows(cur, rows):
+    """Keep only the (pos, values) rows, one per code, that are new or differ
+    from the table.
+
+    Existing content hashes over UPDATE_COLUMNS come back in one query, so
+    unchanged codes are never written. Returns (rows, summary counts).
+    """
+    existing = fetch_hashes(cur, UPDATE_COLUMNS)
+    hts_index = UPSERT_COLUMNS.index('hts_code')
+    update_index = [UPSERT_COLUMNS.index(c) for c in UPDATE_COLUMNS]
+    summary = {'new': 0, 'changed': 0, 'unchanged': 0}
+    keep = []
+    codes = set()
+    for pos, values in rows:
+        code = values[hts_index]
+        codes.add(code)
+        old = existing.get(code)
+        if old is None:
+            summary['new'] += 1
+        elif old != content_hash([values[i] for i in update_index]):
+            summary['changed'] += 1
+        else:
+            summary['unchanged'] += 1
+            continue
+        keep.append((pos, values))
+    summary['not_in_file'] = len(existing.keys() - codes)
+    return keep, summary
+
+def import_data(file_path, dry_run=False, rejects_path=None, delta=False):
     ext = os.path.splitext(file_path)[1].lower()
     
     try:
         if ext == '.csv':
-            df = pd.read_csv(file_path)
+            df = pd.read_csv(file_path, dtype=str)
         elif ext == '.json':
-            df = pd.read_json(file_path)
+            df = pd.read_json(file_path, dtype=False)
         elif ext in ['.xls', '.xlsx']:
-            df = pd.read_excel(file_path)
+            df = pd.read_excel(file_path, dtype=str)
         else:
             print(f"Unsupported file format: {ext}")
             return
@@ -57,11 +106,14 @@ def import_data(file_path, dry_run=False):
     # Required columns
     required = ['hts_code', 'description', 'category']
     missing = [c for c in required if c not in df.columns]
+
+    if 'hts_code' in df.columns:
+        df['hts_code'] = clean_hts_codes(df['hts_code'])
     
     # If category is missing, try to derive from HTS code (Chapter)
     if 'category' in missing and 'hts_code' in df.columns:
         print("Deriving 'category' from HTS Code (Chapter)...")
-        df['category'] = df['hts_code'].apply(lambda x: f"Chapter {str(x)[:2]}")
+        df['category'] = 'Chapter ' + df['hts_code'].str[:2].fillna('')
         missing.remove('category')
 
     if missing:
@@ -69,85 +121,72 @@ def import_data(file_path, dry_run=False):
         return
 
     print(f"Found {len(df)} records.")
-    
-    valid_records = []
-    invalid_records = []
-    
-    for _, row in df.iterrows():
-        record = row.to_dict()
-        record['hts_code'] = clean_hts_code(record['hts_code'])
-        
-        if validate_hts_format(record['hts_code']):
-            valid_records.append(record)
-        else:
-            invalid_records.append(record)
-            
-    print(f"Valid records: {len(valid_records)}")
-    print(f"Invalid format records: {len(invalid_records)}")
-    if len(invalid_records) > 0:
-        print(f"Example invalid: {invalid_records[0]['hts_code']}")
+
+    # 1-based data row numbers, for the rejects file
+    df.index = pd.RangeIndex(1, len(df) + 1)
+    valid = valid_hts_codes(df['hts_code'])
+    invalid_count = int((~valid).sum())
+
+    rejects = Rejects(rejects_path)
+    invalid = without_na(df.loc[~valid])
+    for pos, record in zip(invalid.index.tolist(), invalid.to_dict('records')):
+        rejects.add(pos, record['hts_code'], 'invalid HTS format', record)
+
+    rows, duplicates = latest_rows(df.loc[valid])
+
+    print(f"Valid records: {len(rows)}")
+    print(f"Invalid format records: {invalid_count}")
+    if duplicates:
+        print(f"Duplicate codes (last row kept): {duplicates}")
 
     if dry_run:
+        rejects.close()
         print("Dry run enabled. No changes made to DB.")
         return
 
     conn = get_db_connection()
     cur = conn.cursor()
     
-    upsert_sql = """
-        INSERT INTO public.aes_hts_codes (
-            hts_code, description, category, unit_of_measure, 
-            duty_rate, schedule_b, special_provisions,
-            sub_category, sub_sub_category, uom1, uom2
-        ) VALUES (
-            %(hts_code)s, %(description)s, %(category)s, %(unit_of_measure)s,
-            %(duty_rate)s, %(schedule_b)s, %(special_provisions)s,
-            %(sub_category)s, %(sub_sub_category)s, %(uom1)s, %(uom2)s
-        )
+    upsert_sql = f"""
+        INSERT INTO public.aes_hts_codes ({', '.join(UPSERT_COLUMNS)}) VALUES %s
         ON CONFLICT (hts_code) DO UPDATE SET
-            description = EXCLUDED.description,
-            category = EXCLUDED.category,
-            unit_of_measure = EXCLUDED.unit_of_measure,
-            duty_rate = EXCLUDED.duty_rate,
-            schedule_b = EXCLUDED.schedule_b,
-            special_provisions = EXCLUDED.special_provisions,
-            updated_at = NOW();
+            {''.join(f'{c} = EXCLUDED.{c}, ' for c in UPDATE_COLUMNS)}updated_at = NOW()
+        RETURNING (xmax = 0);
     """
     
-    success_count = 0
-    error_count = 0
-    
-    for rec in valid_records:
-        # Fill missing optional keys with None
-        for key in ['unit_of_measure', 'duty_rate', 'schedule_b', 'special_provisions', 
-                   'sub_category', 'sub_sub_category', 'uom1', 'uom2']:
-            if key not in rec or pd.isna(rec[key]):
-                rec[key] = None
-                
-        try:
-            cur.execute(upsert_sql, rec)
-            success_count += 1
-        except Exception as e:
-            print(f"Error inserting {rec['hts_code']}: {e}")
-            conn.rollback()
-            error_count += 1
-            # Continue to next? usually yes for bulk import
-            continue
-            
-    conn.commit()
-    cur.close()
-    conn.close()
+    try:
+        if delta:
+            rows, summary = changed_rows(cur, rows)
+            print(f"Delta: {summary['new']} new, {summary['changed']} changed, "
+                  f"{summary['unchanged']} unchanged (skipped), "
+                  f"{summary['not_in_file']} in the table but not in the file (kept)")
+
+        # Each failing batch is retried row by row under savepoints, so a bad
+        # row is rejected on its own instead of rolling back its neighbours
+        inserted, updated = write_batches(cur, upsert_sql, rows, UPSERT_COLUMNS, rejects)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        rejects.close()
+        cur.close()
+        conn.close()
     
-    print(f"Import complete. Inserted/Updated: {success_count}, Errors: {error_count}")
+    print(f"Import complete. Inserted: {inserted}, Updated: {updated}, Errors: {rejects.count - invalid_count}")
+    if rejects.count and rejects_path:
+        print(f"{rejects.count} rejected rows written to {rejects_path}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Import HTS Codes from CSV/JSON/Excel")
     parser.add_argument("file", help="Path to data file")
     parser.add_argument("--dry-run", action="store_true", help="Validate without inserting")
+    parser.add_argument("--delta", action="store_true", help="Only write new and changed codes")
+    parser.add_argument("--rejects", default="hts_import_rejects.csv", help="CSV of rows that were not imported, with reasons")
     
     args = parser.parse_args()
     
     if os.path.exists(args.file):
-        import_data(args.file, args.dry_run)
+        import_data(args.file, args.dry_run, args.rejects, args.delta)
     else:
         print(f"File not found: {args.file}")
@@ -3,8 +3,12 @@ import requests
 import psycopg2
 import os
 import sys
+import re
+import json
+import tempfile
 from datetime import datetime
 from dotenv import load_dotenv
+from hts_bulk import HTS_CODE_PATTERN, Rejects, error_reason, write_batches
 
 load_dotenv()
 
@@ -17,15 +21,27 @@ def get_db_connection():
     db_url = os.environ.get("DIRECT_URL") or os.environ.get("DATABASE_URL")
     return psycopg2.connect(db_url)
 
-def fetch_data(url):
+def fetch_data(url, dest, chunk_size=1 << 16):
+    """Download `url` to the open binary file `dest` in chunks; True on success."""
     print(f"Downloading data from {url}...")
     try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        return response.text.splitlines()
+        with requests.get(url, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            size = 0
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                dest.write(chunk)
+                size += len(chunk)
+        dest.flush()
+        print(f"Downloaded {size} bytes")
+        return size > 0
     except Exception as e:
         print(f"Error downloading data: {e}")
-        return None
+        return False
+
+def read_lines(path):
+    """Lines of a concordance file, read lazily."""
+    with open(path, 'r', encoding='latin-1') as f:
+        yield from f
 
 def parse_line_fixed(line):
     # Layout based on IMPAES.TXT structure (0-based indexing)
@@ -66,83 +82,284 @@ def parse_line_fixed(line):
     except Exception:
         return None
 
-def seed_database(lines, dry_run=False):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    total = 0
-    inserted = 0
-    errors = 0
-    
-    print("Starting seeding process...")
-    
-    upsert_sql = """
-        INSERT INTO public.aes_hts_codes (
-            hts_code, description, category, unit_of_measure, uom1, uom2, schedule_b, updated_at
-        ) VALUES (
-            %(hts_code)s, %(description)s, %(category)s, %(unit_of_measure)s, %(uom1)s, %(uom2)s, %(schedule_b)s, NOW()
-        )
+# Columns staged through COPY, in COPY order; line_no keeps the last
+# occurrence of a duplicated code, matching the old row-by-row upsert
+STAGE_COLUMNS = ('line_no', 'hts_code', 'description', 'category', 'unit_of_measure', 'uom1', 'uom2', 'schedule_b')
+UPSERT_COLUMNS = STAGE_COLUMNS[1:]
+
+STAGE_SQL = """
+    CREATE TEMP TABLE aes_hts_stage (
+        line_no bigint NOT NULL,
+        hts_code text,
+        description text,
+        category text,
+        unit_of_measure text,
+        uom1 text,
+        uom2 text,
+        schedule_b text
+    ) ON COMMIT DROP;
+"""
+
+COPY_SQL = f"COPY aes_hts_stage ({', '.join(STAGE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+INVALID_SQL = """
+    SELECT line_no, hts_code, description
+    FROM aes_hts_stage
+    WHERE hts_code !~ %(pattern)s
+    ORDER BY line_no;
+"""
+
+# Last line per valid code; feeds both the merge and its batched fallback
+LATEST_SQL = """
+    SELECT DISTINCT ON (hts_code)
+        line_no, hts_code, description, category, unit_of_measure, uom1, uom2, schedule_b
+    FROM aes_hts_stage
+    WHERE hts_code ~ %(pattern)s
+    ORDER BY hts_code, line_no DESC
+"""
+
+# Columns an existing code takes from the file; the rest keep their values
+UPDATE_COLUMNS = ('description', 'unit_of_measure', 'uom1', 'uom2', 'schedule_b')
+
+UPSERT_SET = f"""
         ON CONFLICT (hts_code) DO UPDATE SET
-            description = EXCLUDED.description,
-            unit_of_measure = EXCLUDED.unit_of_measure,
-            uom1 = EXCLUDED.uom1,
-            uom2 = EXCLUDED.uom2,
-            schedule_b = EXCLUDED.schedule_b,
-            updated_at = NOW();
+            {''.join(f'{c} = EXCLUDED.{c}, ' for c in UPDATE_COLUMNS)}updated_at = NOW()
+        RETURNING (xmax = 0)
+"""
+
+# True when a staged code's update columns differ from the table row
+DIFFERS = (
+    f"({', '.join('t.' + c for c in UPDATE_COLUMNS)}) "
+    f"IS DISTINCT FROM ({', '.join('latest.' + c for c in UPDATE_COLUMNS)})"
+)
+
+# Staged codes that are new or changed; what delta mode writes
+CHANGED_SQL = f"""
+    SELECT latest.*
+    FROM ({LATEST_SQL}) latest
+    LEFT JOIN public.aes_hts_codes t USING (hts_code)
+    WHERE t.id IS NULL OR {DIFFERS}
+"""
+
+# new / changed / unchanged staged codes, and table codes missing from the file
+DELTA_SQL = f"""
+    SELECT
+        count(*) FILTER (WHERE t.id IS NULL),
+        count(*) FILTER (WHERE t.id IS NOT NULL AND {DIFFERS}),
+        count(*) FILTER (WHERE t.id IS NOT NULL AND NOT {DIFFERS}),
+        (SELECT count(*) FROM public.aes_hts_codes c
+         WHERE NOT EXISTS (SELECT 1 FROM aes_hts_stage s WHERE s.hts_code = c.hts_code))
+    FROM ({LATEST_SQL}) latest
+    LEFT JOIN public.aes_hts_codes t USING (hts_code);
+"""
+
+# One statement for the whole file (or, in delta mode, its new and changed
+# codes); xmax = 0 on the returned rows tells fresh inserts from updates
+MERGE_SQL = f"""
+    WITH merged AS (
+        INSERT INTO public.aes_hts_codes ({', '.join(UPSERT_COLUMNS)})
+        SELECT {', '.join(UPSERT_COLUMNS)} FROM ({{source}}) latest
+        {UPSERT_SET} AS inserted
+    )
+    SELECT
+        count(*) FILTER (WHERE inserted),
+        count(*) FILTER (WHERE NOT inserted)
+    FROM merged;
+"""
+
+# Batched fallback when the single merge fails on some row
+UPSERT_SQL = f"""
+        INSERT INTO public.aes_hts_codes ({', '.join(UPSERT_COLUMNS)}) VALUES %s
+        {UPSERT_SET};
+"""
+
+
+class CopyStream:
+    """Read-only file-like over an iterator of text chunks, for cursor.copy_expert."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = ''
+
+    def read(self, size=-1):
+        while size is None or size < 0 or len(self._buf) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buf += chunk
+        if size is None or size < 0:
+            out, self._buf = self._buf, ''
+        else:
+            out, self._buf = self._buf[:size], self._buf[size:]
+        return out
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+def copy_value(value):
+    # COPY csv: an unquoted empty field is NULL, a quoted one is ''
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_chunks(rows, columns, rows_per_chunk=1000):
+    """CSV text for COPY FROM STDIN, a chunk of rows at a time."""
+    buf = []
+    for row in rows:
+        buf.append(','.join(copy_value(row[c]) for c in columns) + '\n')
+        if len(buf) >= rows_per_chunk:
+            yield ''.join(buf)
+            buf = []
+    if buf:
+        yield ''.join(buf)
+
+
+def parse_records(lines, stats, rejects, dry_run=False):
+    """Parsed records for the non-blank `lines`, one at a time.
+
+    Counts lines and unparseable lines into `stats` ('total', 'parse_errors')
+    as it goes, and sends unparseable lines to `rejects`, so nothing but the
+    current line is held in memory.
     """
-    
     for line in lines:
         if not line.strip():
             continue
-            
-        total += 1
+
+        stats['total'] += 1
         record = parse_line_fixed(line)
-        
+
         if not record:
-            # Try delimited if fixed fails? 
+            # Try delimited if fixed fails?
             # For now assume fixed based on documentation
-            errors += 1
+            stats['parse_errors'] += 1
+            rejects.add(stats['total'], None, 'unparseable line', line.rstrip('\r\n'))
             continue
-            
-        if dry_run:
-            if total <= 5:
-                print(f"Dry Run Record: {record}")
-            continue
-            
-        try:
-            cur.execute(upsert_sql, record)
-            inserted += 1
-            
-            # Commit every 1000 records
-            if inserted % 1000 == 0:
-                conn.commit()
-                print(f"Processed {inserted} records...")
-                
-        except Exception as e:
-            conn.rollback()
-            # print(f"Error inserting {record['hts_code']}: {e}")
-            errors += 1
-            
-    conn.commit()
-    
-    # Log to audit (summary)
-    if not dry_run:
+
+        if dry_run and stats['total'] <= 5:
+            print(f"Dry Run Record: {record}")
+
+        record['line_no'] = stats['total']
+        yield record
+
+
+def merge_staged(conn, cur, rejects, source=LATEST_SQL):
+    """Merge the `source` rows of the staging table into aes_hts_codes;
+    returns (inserted, updated).
+
+    Runs the single-statement merge first. If any row makes it fail, the
+    merge is rolled back to a savepoint and the staged rows are replayed in
+    batches, where only the failing rows are rejected.
+    """
+    cur.execute("SAVEPOINT hts_merge")
+    try:
+        cur.execute(MERGE_SQL.format(source=source), {'pattern': HTS_CODE_PATTERN})
+        inserted, updated = cur.fetchone()
+        cur.execute("RELEASE SAVEPOINT hts_merge")
+        return inserted, updated
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT hts_merge")
+        print(f"Bulk merge failed ({error_reason(e)}), retrying in batches...")
+
+    staged = conn.cursor(name='aes_hts_latest')
+    staged.itersize = 1000
+    try:
+        staged.execute(source, {'pattern': HTS_CODE_PATTERN})
+        rows = ((row[0], row[1:]) for row in staged)
+        return write_batches(cur, UPSERT_SQL, rows, UPSERT_COLUMNS, rejects)
+    finally:
+        staged.close()
+
+
+def seed_database(lines, dry_run=False, rejects_path=None, delta=False):
+    stats = {'total': 0, 'parse_errors': 0}
+
+    print("Starting seeding process...")
+
+    if dry_run:
+        with Rejects(rejects_path) as rejects:
+            staged = invalid = 0
+            for record in parse_records(lines, stats, rejects, dry_run):
+                staged += 1
+                if not re.match(HTS_CODE_PATTERN, record['hts_code']):
+                    invalid += 1
+                    rejects.add(record['line_no'], record['hts_code'], 'invalid HTS format', record['description'])
+        print(f"\nDry Run Complete.")
+        print(f"Total Lines: {stats['total']}")
+        print(f"Parsed: {staged}")
+        print(f"Skipped/Errors: {rejects.count} ({stats['parse_errors']} unparseable, {invalid} invalid HTS format)")
+        if rejects_path:
+            print(f"Rejects written to {rejects_path}")
+        return
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    rejects = Rejects(rejects_path)
+    try:
+        cur.execute(STAGE_SQL)
+        records = parse_records(lines, stats, rejects)
+        cur.copy_expert(COPY_SQL, CopyStream(copy_chunks(records, STAGE_COLUMNS)))
+        staged = cur.rowcount
+        print(f"Staged {staged} records, merging...")
+
+        cur.execute(INVALID_SQL, {'pattern': HTS_CODE_PATTERN})
+        for line_no, hts_code, description in cur.fetchall():
+            rejects.add(line_no, hts_code, 'invalid HTS format', description)
+        invalid = rejects.counts.get('invalid HTS format', 0)
+
+        cur.execute(DELTA_SQL, {'pattern': HTS_CODE_PATTERN})
+        new, changed, unchanged, missing = cur.fetchone()
+
+        # Delta mode leaves unchanged codes alone: no updated_at bump, no
+        # history rows from trg_aes_hts_changes
+        inserted, updated = merge_staged(conn, cur, rejects, CHANGED_SQL if delta else LATEST_SQL)
+        total, parse_errors = stats['total'], stats['parse_errors']
+        failed = rejects.count - parse_errors - invalid
+        duplicates = staged - invalid - new - changed - unchanged
+        errors = rejects.count
+
         cur.execute("""
             INSERT INTO public.audit_logs (
                 action, resource_type, details, created_at
             ) VALUES (
                 'SEED_AES_HTS_CENSUS', 'aes_hts_codes', %s, NOW()
             );
-        """, (f'{{"total_processed": {total}, "inserted_updated": {inserted}, "errors": {errors}}}',))
+        """, (json.dumps({
+            'total_processed': total,
+            'inserted_updated': inserted + updated,
+            'inserted': inserted,
+            'updated': updated,
+            'mode': 'delta' if delta else 'full',
+            'new': new,
+            'changed': changed,
+            'unchanged': unchanged,
+            'not_in_file': missing,
+            'duplicates': duplicates,
+            'errors': errors,
+            'rejects': rejects.counts,
+        }),))
+        # Staging table, merge and audit entry land in one transaction
         conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        rejects.close()
+        cur.close()
+        conn.close()
 
-    cur.close()
-    conn.close()
-    
     print(f"\nSeeding Complete.")
     print(f"Total Lines: {total}")
-    print(f"Inserted/Updated: {inserted}")
-    print(f"Skipped/Errors: {errors}")
+    print(f"Inserted: {inserted}")
+    print(f"Updated: {updated}")
+    print(f"Delta: {new} new, {changed} changed, {unchanged} unchanged{' (skipped)' if delta else ''}, "
+          f"{missing} in the table but not in the file (kept)")
+    if duplicates:
+        print(f"Duplicate Codes (last line kept): {duplicates}")
+    print(f"Skipped/Errors: {errors} ({parse_errors} unparseable, {invalid} invalid HTS format, {failed} rejected by the database)")
+    if rejects_path:
+        print(f"Rejects written to {rejects_path}")
 
 def generate_validation_report():
     conn = get_db_connection()
@@ -185,26 +402,34 @@ if __name__ == "__main__":
     parser.add_argument("--url", default=DEFAULT_URL, help="URL to Census Concordance File")
     parser.add_argument("--file", help="Path to local file (overrides URL)")
     parser.add_argument("--dry-run", action="store_true", help="Validate without DB changes")
+    parser.add_argument("--delta", action="store_true", help="Only write new and changed codes")
+    parser.add_argument("--rejects", default="aes_hts_rejects.csv", help="CSV of lines that were not loaded, with reasons")
     
     args = parser.parse_args()
     
-    lines = []
     if args.file and os.path.exists(args.file):
         print(f"Reading from local file: {args.file}")
-        try:
-            with open(args.file, 'r', encoding='latin-1') as f:
-                lines = f.readlines()
-        except Exception as e:
-            print(f"Error reading file: {e}")
-            sys.exit(1)
+        path = args.file
     else:
-        # Try default URL if no file provided
-        lines = fetch_data(args.url)
-        if not lines:
+        # Try default URL if no file provided; the download goes to disk so
+        # parsing and COPY stream from a file instead of the response body
+        download = tempfile.NamedTemporaryFile(prefix='aes_hts_', suffix='.txt', delete=False)
+        with download:
+            ok = fetch_data(args.url, download)
+        path = download.name
+        if not ok:
+            os.unlink(path)
             print("Failed to fetch data from URL. Please provide a local file with --file.")
             sys.exit(1)
-            
-    seed_database(lines, args.dry_run)
-    
+
+    try:
+        seed_database(read_lines(path), args.dry_run, args.rejects, args.delta)
+    except OSError as e:
+        print(f"Error reading file: {e}")
+        sys.exit(1)
+    finally:
+        if path != args.file:
+            os.unlink(path)
+
     if not args.dry_run:
         generate_validation_report()
@@ -1,58 +1,675 @@
-from fastapi import FastAPI, HTTPException
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 import numpy as np
 import pandas as pd
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
+import models
+import metrics
+import hierarchy
 
-app = FastAPI(title="Forecast Service", version="0.1.0")
+class PoolSaturated(Exception):
+    """Raised when the fit queue is full; mapped to HTTP 503."""
+
+
+class FitPool:
+    """Process pool for model fits with a bounded number of pending jobs.
+
+    `pending` counts fits submitted and not yet finished (running + queued).
+    A fit that times out keeps its slot until the worker actually finishes,
+    so a stuck optimizer still shows up as backpressure.
+    """
+
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def saturated(self):
+        with self._lock:
+            return self.pending >= self.max_pending
+
+    def _release(self, _future):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PoolSaturated(f"fit queue full ({self.pending}/{self.max_pending})")
+            self.pending += 1
+        try:
+            future = self.executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool and retry once
+            self._executor = None
+            try:
+                future = self.executor().submit(fn, *args)
+            except Exception:
+                self._release(None)
+                raise
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self.pending,
+                "running": min(self.pending, self.workers),
+                "queued": max(0, self.pending - self.workers),
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Worker processes for fits; defaults to one per core
+FORECAST_WORKERS = int(os.environ.get("FORECAST_WORKERS", "0") or 0) or (os.cpu_count() or 1)
+
+# Rolling-origin folds used by model="auto"
+BACKTEST_FOLDS = int(os.environ.get("FORECAST_BACKTEST_FOLDS", "3"))
+
+fit_pool = FitPool(
+    workers=FORECAST_WORKERS,
+    max_pending=int(os.environ.get("FORECAST_MAX_PENDING", "0") or 0) or FORECAST_WORKERS * 4,
+    timeout=float(os.environ.get("FORECAST_FIT_TIMEOUT", "30")),
+)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    fit_pool.shutdown()
+
+
+app = FastAPI(title="Forecast Service", version="0.1.0", lifespan=lifespan)
 
 class SeriesPoint(BaseModel):
     timestamp: str
     value: float
 
-class ForecastRequest(BaseModel):
-    series: List[SeriesPoint]
+class SeriesInput(BaseModel):
+    """History for one series, in any of these shapes:
+
+    - `series`: list of {timestamp, value} points (original schema)
+    - `series`: bare list of numbers, optionally with `start`/`freq`
+    - `timestamps` + `values`: parallel arrays
+    - `values`, optionally with `start`/`freq`
+
+    Without timestamps the series is taken to end today at `freq` (default "D").
+    """
+    series: Optional[Union[List[float], List[SeriesPoint]]] = None
+    timestamps: Optional[List[str]] = None
+    values: Optional[List[float]] = None
+    start: Optional[str] = None
+    freq: Optional[str] = None
+
+class ForecastRequest(SeriesInput):
     horizon: int = 14
-    seasonality: Optional[int] = None  # e.g., 7 for weekly seasonality
+    seasonality: Optional[int] = None  # defaults from the series frequency, e.g. 7 daily, 12 monthly
     trend: Optional[str] = "add"
     seasonal: Optional[str] = "add"
+    model: str = "auto"  # "auto" or one of models.MODEL_NAMES
+    levels: Optional[List[float]] = None  # interval coverage, e.g. [80, 95] or [0.8, 0.95]
+    # Stable id (e.g. tenant/lane) enabling incremental refits as the history grows
+    series_id: Optional[str] = None
+    refit: str = "auto"  # "auto" (incremental when possible) or "full"
 
 class ForecastResponse(BaseModel):
     ok: bool
     forecast: List[float]
     timestamps: List[str]
+    model: Optional[str] = None
+    # {"80": {"lower": [...], "upper": [...]}, ...}; only when levels were requested
+    intervals: Optional[Dict[str, Dict[str, List[float]]]] = None
+    fit_mode: Optional[str] = None  # "cached", "incremental" or "full"
 
-@app.post("/forecast", response_model=ForecastResponse)
-def forecast(req: ForecastRequest):
+class NamedSeries(SeriesInput):
+    id: str
+    # Per-series overrides of the batch-level settings
+    horizon: Optional[int] = None
+    seasonality: Optional[int] = None
+
+class BatchForecastRequest(BaseModel):
+    series: List[NamedSeries]
+    horizon: int = 14
+    seasonality: Optional[int] = None
+    trend: Optional[str] = "add"
+    seasonal: Optional[str] = "add"
+    model: str = "auto"
+    levels: Optional[List[float]] = None
+    refit: str = "auto"  # item ids double as series ids for incremental refits
+
+
+class HierarchySeries(SeriesInput):
+    path: List[str]  # bottom-level node path, e.g. ["tenant-a", "USNYC-CNSHA", "40HC"]
+
+class HierarchyRequest(BaseModel):
+    series: List[HierarchySeries]
+    hierarchy: Optional[List[str]] = None  # level names for the path entries, e.g. ["tenant", "lane", "container_type"]
+    method: str = "bottom_up"  # one of hierarchy.METHODS
+    horizon: int = 14
+    seasonality: Optional[int] = None
+    trend: Optional[str] = "add"
+    seasonal: Optional[str] = "add"
+    model: str = "auto"
+    refit: str = "auto"
+
+
+class InvalidSeries(ValueError):
+    """Raised for malformed or too-short input; mapped to HTTP 400."""
+
+
+def decode_series(item, min_points=5):
+    """Decode a SeriesInput into sorted (ds, y, freq).
+
+    ds is a DatetimeIndex that keeps the caller's UTC offset, if any; y is a
+    float64 array; freq is the caller's `freq` or None. Timestamps are parsed
+    in one vectorized pd.to_datetime call.
+    """
+    raw = item.series
+    timestamps = item.timestamps
+    if raw and not isinstance(raw[0], (int, float)):
+        timestamps = [p.timestamp for p in raw]
+        y = np.fromiter((p.value for p in raw), dtype=np.float64, count=len(raw))
+    elif raw:
+        y = np.asarray(raw, dtype=np.float64)
+    elif item.values:
+        y = np.asarray(item.values, dtype=np.float64)
+    else:
+        raise InvalidSeries("Insufficient data points")
+    if len(y) < min_points:
+        raise InvalidSeries("Insufficient data points")
+
+    if timestamps is not None:
+        if len(timestamps) != len(y):
+            raise InvalidSeries(f"timestamps ({len(timestamps)}) and values ({len(y)}) differ in length")
+        try:
+            ds = pd.DatetimeIndex(pd.to_datetime(timestamps))
+        except (ValueError, TypeError) as e:
+            raise InvalidSeries(f"Invalid timestamps: {e}")
+        if not ds.is_monotonic_increasing:
+            order = ds.argsort(kind="stable")
+            ds, y = ds[order], y[order]
+    else:
+        freq = item.freq or "D"
+        try:
+            if item.start:
+                idx = pd.date_range(start=item.start, periods=len(y), freq=freq)
+            else:
+                idx = pd.date_range(end=pd.Timestamp.today().normalize(), periods=len(y), freq=freq)
+        except (ValueError, TypeError) as e:
+            raise InvalidSeries(f"Invalid start/freq: {e}")
+        ds = idx
+    return ds, y, item.freq
+
+
+class ModelCache:
+    """LRU cache with a per-entry TTL; thread-safe. Holds fitted models and per-series fit state."""
+
+    def __init__(self, max_entries=256, ttl_seconds=600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.monotonic() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+model_cache = ModelCache(
+    max_entries=int(os.environ.get("FORECAST_CACHE_SIZE", "256")),
+    ttl_seconds=float(os.environ.get("FORECAST_CACHE_TTL", "600")),
+)
+
+# Last fit per series id: {"key", "n", "model", "params", "updates"}
+series_state = ModelCache(
+    max_entries=int(os.environ.get("FORECAST_STATE_SIZE", "10000")),
+    ttl_seconds=float(os.environ.get("FORECAST_STATE_TTL", str(7 * 86400))),
+)
+# Server-Timing header on /forecast responses with per-stage durations
+SERVER_TIMING = os.environ.get("FORECAST_SERVER_TIMING", "true").lower() == "true"
+
+# Incremental updates allowed before a series is fully re-optimized again
+FULL_REFIT_EVERY = int(os.environ.get("FORECAST_FULL_REFIT_EVERY", "30"))
+
+
+def model_key(ds, y, seasonality=None, trend="add", seasonal="add", model="auto"):
+    """Content hash of everything that determines the fitted model (not the horizon).
+
+    With ds=None only the values and settings are hashed; series state uses
+    that so bare arrays anchored at "today" still match their previous prefix.
+    """
+    h = hashlib.sha256()
+    h.update(y.tobytes())
+    if ds is not None:
+        ds = pd.DatetimeIndex(ds)
+        h.update(ds.asi8.tobytes())
+        h.update(f"|{ds.tz}".encode("utf-8"))
+    h.update(f"|{trend}|{seasonal}|{seasonality}|{model}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def fit_model(ds, y, seasonality=None, trend="add", seasonal="add", model="auto", warm=None):
+    """Fit `model` (or the backtest winner for "auto") on one decoded series.
+
+    With `warm` ({"model", "params"} from this series' previous fit), the
+    stored parameters are replayed over the longer history instead.
+
+    Returns (name, fitted, last_ts, freq). Arrays in and a picklable
+    tuple out, so it can run in a worker process.
+    """
+    idx = pd.DatetimeIndex(ds)
+    freq = (pd.infer_freq(idx) if len(idx) >= 3 else None) or "D"
+    m = seasonality or models.default_period(freq)
+    name, fitted = models.fit_series(y, m, model, trend, seasonal, BACKTEST_FOLDS, warm)
+    return name, fitted, idx[-1], freq
+
+
+def timed_fit_model(*args):
+    """fit_model plus the seconds spent inside the worker, so queue wait can be told apart."""
+    t0 = time.perf_counter()
+    fitted = fit_model(*args)
+    return fitted, time.perf_counter() - t0
+
+
+def warm_state(series_id, y, seasonality, trend, seasonal, model):
+    """Previous fit for `series_id` if the new history extends it with the same settings."""
+    st = series_state.get(series_id)
+    if st is None or st["updates"] >= FULL_REFIT_EVERY or len(y) < st["n"]:
+        return None
+    n = st["n"]
+    if model_key(None, y[:n], seasonality, trend, seasonal, model) != st["key"]:
+        return None
+    return st
+
+
+def remember_state(series_id, y, fitted, seasonality, trend, seasonal, model, updates):
+    series_state.put(series_id, {
+        "key": model_key(None, y, seasonality, trend, seasonal, model),
+        "n": len(y),
+        "model": fitted[0],
+        "params": fitted[1].params,
+        "updates": updates,
+    })
+
+
+def forecast_from(fitted, horizon, freq=None, levels=None):
+    name, fit, last_ts, inferred = fitted
+    pred = fit.forecast(horizon)
+    future_idx = pd.date_range(last_ts, periods=horizon + 1, freq=freq or inferred)[1:]
+    out = {
+        "forecast": [float(x) for x in pred.tolist()],
+        "timestamps": [str(ts) for ts in future_idx],
+        "model": name,
+    }
+    if levels:
+        out["intervals"] = {
+            label: {"lower": lower.tolist(), "upper": upper.tolist()}
+            for label, (lower, upper) in fit.intervals(horizon, levels).items()
+        }
+    return out
+
+
+def check_options(model="auto", levels=None, refit="auto"):
+    """Validate per-request options; returns `levels` as fractions. Raises InvalidSeries."""
+    if model != "auto" and model not in models.MODEL_NAMES:
+        raise InvalidSeries(f"Unknown model '{model}'; expected auto or one of {', '.join(models.MODEL_NAMES)}")
+    if refit not in ("auto", "full"):
+        raise InvalidSeries(f"Unknown refit '{refit}'; expected auto or full")
     try:
-        if not req.series or len(req.series) < 5:
-            raise HTTPException(status_code=400, detail="Insufficient data points")
-        df = pd.DataFrame([{"ds": p.timestamp, "y": p.value} for p in req.series])
-        df["ds"] = pd.to_datetime(df["ds"])
-        df = df.sort_values("ds")
-
-        seasonal_periods = req.seasonality or 7
-        model = ExponentialSmoothing(
-            df["y"].astype(float),
-            trend=req.trend,
-            seasonal=req.seasonal,
-            seasonal_periods=seasonal_periods,
-            initialization_method="estimated",
-        )
-        fit = model.fit(optimized=True)
-        pred = fit.forecast(req.horizon)
+        return models.parse_levels(levels)
+    except ValueError as e:
+        raise InvalidSeries(str(e))
 
-        last_ts = df["ds"].iloc[-1]
-        freq = pd.infer_freq(df["ds"]) or "D"
-        future_idx = pd.date_range(last_ts, periods=req.horizon + 1, freq=freq)[1:]
 
-        return ForecastResponse(
-            ok=True,
-            forecast=[float(x) for x in pred.tolist()],
-            timestamps=[str(ts) for ts in future_idx],
+async def fit_forecast(item, horizon, seasonality=None, trend="add", seasonal="add", model="auto", levels=None,
+                       series_id=None, refit="auto", timer=None):
+    """Forecast `horizon` steps for a SeriesInput, reusing a cached fit for identical history and settings.
+
+    Prediction intervals for `levels` come from the same fitted model. With a
+    `series_id`, a history that extends the previous one is refit
+    incrementally (previous parameters, no optimizer) until FULL_REFIT_EVERY
+    updates have passed or refit="full" is requested.
+
+    Cache misses are fitted in `fit_pool`; raises InvalidSeries, PoolSaturated or asyncio.TimeoutError.
+    Stage durations are recorded on `timer` (a metrics.StageTimer).
+    """
+    timer = timer or metrics.StageTimer()
+    levels = check_options(model, levels, refit)
+    with timer.stage("decode"):
+        ds, y, freq = decode_series(item)
+    return await forecast_arrays(ds, y, freq, horizon, seasonality, trend, seasonal, model, levels,
+                                 series_id, refit, timer)
+
+
+async def forecast_arrays(ds, y, freq, horizon, seasonality=None, trend="add", seasonal="add", model="auto",
+                          levels=None, series_id=None, refit="auto", timer=None):
+    """fit_forecast for an already decoded series (see decode_series); options are not re-validated."""
+    timer = timer or metrics.StageTimer()
+    key = model_key(ds, y, seasonality, trend, seasonal, model)
+    metrics.SERIES_LENGTH.observe(len(y))
+    fitted = model_cache.get(key) if refit == "auto" else None
+    mode = "cached"
+    if fitted is None:
+        st = warm_state(series_id, y, seasonality, trend, seasonal, model) if series_id and refit == "auto" else None
+        warm = {"model": st["model"], "params": st["params"]} if st else None
+        t0 = time.perf_counter()
+        fitted, fit_seconds = await fit_pool.run(timed_fit_model, ds, y, seasonality, trend, seasonal, model, warm)
+        timer.add("queue", max(0.0, time.perf_counter() - t0 - fit_seconds))
+        timer.add("fit", fit_seconds)
+        model_cache.put(key, fitted)
+        mode = "incremental" if st else "full"
+        if series_id:
+            remember_state(series_id, y, fitted, seasonality, trend, seasonal, model,
+                           st["updates"] + 1 if st else 0)
+    elif series_id:
+        # The same history may have been fitted for another caller first;
+        # record it so this id's next, longer history refits incrementally
+        st = series_state.get(series_id)
+        if st is None or st["n"] < len(y):
+            remember_state(series_id, y, fitted, seasonality, trend, seasonal, model, st["updates"] if st else 0)
+    metrics.FITS.labels(mode, fitted[0]).inc()
+    with timer.stage("forecast"):
+        return {**forecast_from(fitted, horizon, freq, levels), "fit_mode": mode}
+
+
+def busy_error(e):
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+def error_type(e):
+    if isinstance(e, (InvalidSeries, models.InsufficientHistory)):
+        return "invalid"
+    if isinstance(e, PoolSaturated):
+        return "saturated"
+    if isinstance(e, asyncio.TimeoutError):
+        return "timeout"
+    return "internal"
+
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    request.state.received = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.REQUESTS.labels(route.path if route else "unmatched", str(response.status_code)).inc()
+    return response
+
+
+@app.post("/forecast", response_model=ForecastResponse)
+async def forecast(req: ForecastRequest, request: Request):
+    timer = metrics.StageTimer()
+    timer.add("parse", time.perf_counter() - request.state.received)
+    try:
+        out = await fit_forecast(
+            req,
+            req.horizon,
+            req.seasonality,
+            req.trend,
+            req.seasonal,
+            req.model,
+            req.levels,
+            req.series_id,
+            req.refit,
+            timer,
         )
+        with timer.stage("serialize"):
+            body = ForecastResponse(ok=True, **out).model_dump_json()
+        headers = {"Server-Timing": timer.header()} if SERVER_TIMING else None
+        return Response(content=body, media_type="application/json", headers=headers)
     except HTTPException as he:
         raise he
     except Exception as e:
+        metrics.ERRORS.labels("/forecast", error_type(e)).inc()
+        if isinstance(e, (InvalidSeries, models.InsufficientHistory)):
+            raise HTTPException(status_code=400, detail=str(e))
+        if isinstance(e, PoolSaturated):
+            raise busy_error(e)
+        if isinstance(e, asyncio.TimeoutError):
+            raise HTTPException(status_code=504, detail=f"Fit exceeded {fit_pool.timeout:g}s")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/forecast/batch")
+async def forecast_batch(req: BatchForecastRequest, request: Request):
+    """Fit many series in parallel; streams one NDJSON line per series as each finishes.
+
+    Lines are `{"id", "ok": true, "forecast", "timestamps", "model"[, "intervals"]}` or
+    `{"id", "ok": false, "error"}`, in completion order, not request order.
+    """
+    metrics.STAGE_SECONDS.labels("parse").observe(time.perf_counter() - request.state.received)
+    if not req.series:
+        raise HTTPException(status_code=400, detail="No series provided")
+    ids = [s.id for s in req.series]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Duplicate series ids")
+
+    if fit_pool.saturated():
+        raise busy_error(PoolSaturated("fit queue full"))
+    # Keep one batch from taking every queue slot at once
+    slots = asyncio.Semaphore(fit_pool.workers)
+
+    async def run(item):
+        try:
+            async with slots:
+                out = await fit_forecast(
+                    item,
+                    item.horizon or req.horizon,
+                    item.seasonality or req.seasonality,
+                    req.trend,
+                    req.seasonal,
+                    req.model,
+                    req.levels,
+                    item.id,
+                    req.refit,
+                )
+            return {"id": item.id, "ok": True, **out}
+        except Exception as e:
+            metrics.ERRORS.labels("/forecast/batch", error_type(e)).inc()
+            if isinstance(e, asyncio.TimeoutError):
+                return {"id": item.id, "ok": False, "error": f"Fit exceeded {fit_pool.timeout:g}s"}
+            return {"id": item.id, "ok": False, "error": str(e)}
+
+    tasks = [asyncio.ensure_future(run(item)) for item in req.series]
+
+    async def stream():
+        try:
+            for done in asyncio.as_completed(tasks):
+                line = await done
+                t0 = time.perf_counter()
+                encoded = json.dumps(line) + "\n"
+                metrics.STAGE_SECONDS.labels("serialize").observe(time.perf_counter() - t0)
+                yield encoded
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/forecast/hierarchy")
+async def forecast_hierarchy(req: HierarchyRequest, request: Request):
+    """Coherent forecasts for every node of a hierarchy built from the bottom series' paths.
+
+    bottom_up fits only the bottom series and sums them. ols / wls_struct
+    also fit each aggregate (on the summed history) and reconcile all nodes
+    MinT-style, see hierarchy.reconcile. Bottom series must share timestamps.
+    Returns {"method", "timestamps", "fits", "nodes": [{"path", "key",
+    "level", "forecast", "base_model"}]}, with the grand total first (path []).
+    """
+    metrics.STAGE_SECONDS.labels("parse").observe(time.perf_counter() - request.state.received)
+    try:
+        check_options(req.model, None, req.refit)
+        if req.method not in hierarchy.METHODS:
+            raise InvalidSeries(f"Unknown method '{req.method}'; expected one of {', '.join(hierarchy.METHODS)}")
+        if not req.series:
+            raise InvalidSeries("No series provided")
+        try:
+            nodes, S, bottom_rows = hierarchy.summing_matrix([s.path for s in req.series])
+        except ValueError as e:
+            raise InvalidSeries(str(e))
+        if req.hierarchy is not None and len(req.hierarchy) != len(nodes[-1]):
+            raise InvalidSeries(f"hierarchy names {len(req.hierarchy)} levels, paths have {len(nodes[-1])}")
+        decoded = [decode_series(s) for s in req.series]
+    except InvalidSeries as e:
+        metrics.ERRORS.labels("/forecast/hierarchy", "invalid").inc()
+        raise HTTPException(status_code=400, detail=str(e))
+    ds, _, freq = decoded[0]
+    for s, (ds_j, _, _) in zip(req.series, decoded):
+        if not ds_j.equals(ds):
+            metrics.ERRORS.labels("/forecast/hierarchy", "invalid").inc()
+            raise HTTPException(status_code=400, detail=f"Series {'/'.join(s.path)} does not share the other series' timestamps")
+    if fit_pool.saturated():
+        raise busy_error(PoolSaturated("fit queue full"))
+
+    bottom = np.vstack([y for _, y, _ in decoded])
+    if req.method == "bottom_up":
+        fit_rows = list(bottom_rows)
+        histories = {int(r): bottom[j] for j, r in enumerate(bottom_rows)}
+    else:
+        fit_rows = list(range(len(nodes)))
+        all_y = hierarchy.aggregate(S, bottom)
+        histories = {r: all_y[r] for r in fit_rows}
+
+    slots = asyncio.Semaphore(fit_pool.workers)
+
+    async def run(row):
+        async with slots:
+            return await forecast_arrays(
+                ds, histories[row], freq, req.horizon, req.seasonality, req.trend, req.seasonal, req.model,
+                None, "hierarchy:" + "/".join(nodes[row]), req.refit,
+            )
+
+    results = await asyncio.gather(*(run(r) for r in fit_rows), return_exceptions=True)
+    failed = [(nodes[r], e) for r, e in zip(fit_rows, results) if isinstance(e, BaseException)]
+    if failed:
+        path, e = failed[0]
+        metrics.ERRORS.labels("/forecast/hierarchy", error_type(e)).inc()
+        detail = f"{len(failed)} node fit(s) failed; first {'/'.join(path) or '(total)'}: {e}"
+        if isinstance(e, PoolSaturated):
+            raise busy_error(detail)
+        status = 400 if isinstance(e, (InvalidSeries, models.InsufficientHistory)) else 500
+        raise HTTPException(status_code=status, detail=detail)
+
+    by_row = dict(zip(fit_rows, results))
+    base = np.array([by_row[r]["forecast"] for r in fit_rows])
+    coherent = hierarchy.reconcile(S, base, req.method, bottom_rows)
+    names = req.hierarchy or []
+    return {
+        "ok": True,
+        "method": req.method,
+        "timestamps": results[0]["timestamps"],
+        "fits": len(fit_rows),
+        "nodes": [
+            {
+                "path": list(node),
+                "key": "/".join(node),
+                "level": "total" if not node else (names[len(node) - 1] if names else len(node)),
+                "forecast": coherent[i].tolist(),
+                "base_model": by_row[i]["model"] if i in by_row else None,
+            }
+            for i, node in enumerate(nodes)
+        ],
+    }
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return model_cache.stats()
+
+
+@app.get("/healthz")
+def healthz():
+    return {"ok": True, "pool": fit_pool.stats(), "cache": model_cache.stats()}
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(content=metrics.generate_latest(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
+CACHE_COUNTERS = ("hits", "misses", "evictions")
+metrics.StatsCollector.register({
+    "forecast_cache": (model_cache.stats, CACHE_COUNTERS, ("size", "max_entries")),
+    "forecast_series_state": (series_state.stats, CACHE_COUNTERS, ("size", "max_entries")),
+    "forecast_pool": (
+        fit_pool.stats,
+        ("completed", "rejected", "timeouts"),
+        ("workers", "pending", "running", "queued", "max_pending"),
+    ),
+})
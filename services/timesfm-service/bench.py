@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""Benchmark / load test for the forecast service.
+
+Drives /forecast and /forecast/batch with synthetic series across a matrix
+of lengths, seasonal periods and concurrency levels, and records latency
+percentiles, throughput and server RSS into a JSON artifact.
+
+Usage:
+  # start a local uvicorn on a free port, run the matrix, write results
+  python bench.py --spawn --out bench-results.json
+
+  # against a running service, compared with a stored baseline
+  python bench.py --url http://localhost:8080 --baseline bench-baseline.json
+
+Exits 1 when --baseline is given and any scenario regresses by more than
+--tolerance (p95 latency up, or throughput down).
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import socket
+import platform
+import argparse
+import subprocess
+import urllib.request
+from urllib import error
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Seasonal period -> pandas freq used for the synthetic timestamps
+FREQS = {7: "D", 12: "MS", 52: "W"}
+
+
+def synth_series(n, period, seed):
+    """Trend + seasonality + noise, as a values/start/freq request body."""
+    rnd = random.Random(seed)
+    level = rnd.uniform(20, 200)
+    slope = rnd.uniform(-0.05, 0.2)
+    amp = rnd.uniform(0.1, 0.4) * level
+    values = [
+        max(0.0, level + slope * i + amp * math.sin(2 * math.pi * i / period) + rnd.gauss(0, 0.05 * level))
+        for i in range(n)
+    ]
+    return {"values": values, "start": "2020-01-01", "freq": FREQS.get(period, "D")}
+
+
+def post(url, body, timeout):
+    data = json.dumps(body).encode("utf-8")
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"}, method="POST")
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except error.HTTPError as e:
+        e.read()
+        status = e.code
+    except Exception:
+        status = None
+    return time.perf_counter() - t0, status
+
+
+def percentile(sorted_vals, q):
+    if not sorted_vals:
+        return None
+    k = (len(sorted_vals) - 1) * q
+    lo, hi = math.floor(k), math.ceil(k)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+
+def tree_rss_bytes(pid):
+    """RSS of `pid` plus its descendants (uvicorn + fit workers), from /proc."""
+    if pid is None or not os.path.isdir("/proc"):
+        return None
+    total = 0
+    stack = [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+            with open(f"/proc/{p}/task/{p}/children") as f:
+                stack.extend(int(c) for c in f.read().split())
+        except OSError:
+            continue
+    return total
+
+
+def run_scenario(base_url, scenario, requests_per, timeout, server_pid, seed):
+    endpoint = scenario["endpoint"]
+    url = base_url.rstrip("/") + endpoint
+
+    def body(i):
+        # cached scenarios resend one series; otherwise every request is a cache miss
+        s = seed if scenario.get("cached") else seed + i
+        if endpoint == "/forecast/batch":
+            items = [
+                {"id": f"s{s}-{j}", **synth_series(scenario["length"], scenario["period"], s * 1000 + j)}
+                for j in range(scenario["batch"])
+            ]
+            return {"series": items, "horizon": scenario["horizon"]}
+        return {**synth_series(scenario["length"], scenario["period"], s), "horizon": scenario["horizon"]}
+
+    bodies = [body(i) for i in range(requests_per)]
+    if scenario.get("cached"):
+        post(url, bodies[0], timeout)  # prime the cache
+    peak_rss = tree_rss_bytes(server_pid) or 0
+    latencies, statuses = [], {}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=scenario["concurrency"]) as pool:
+        futures = [pool.submit(post, url, b, timeout) for b in bodies]
+        for fut in futures:
+            dt, status = fut.result()
+            latencies.append(dt)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            rss = tree_rss_bytes(server_pid)
+            if rss:
+                peak_rss = max(peak_rss, rss)
+    wall = time.perf_counter() - started
+    latencies.sort()
+    ok = statuses.get("200", 0)
+    series_per_request = scenario.get("batch", 1)
+    return {
+        **scenario,
+        "requests": requests_per,
+        "ok": ok,
+        "statuses": statuses,
+        "wall_seconds": wall,
+        "throughput_rps": requests_per / wall if wall else None,
+        "series_per_second": ok * series_per_request / wall if wall else None,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50) * 1000,
+            "p95": percentile(latencies, 0.95) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "max": latencies[-1] * 1000,
+        },
+        "peak_rss_mb": peak_rss / 2 ** 20 if peak_rss else None,
+    }
+
+
+def build_matrix(args):
+    scenarios = []
+    for length in args.lengths:
+        for period in args.periods:
+            for conc in args.concurrency:
+                scenarios.append({
+                    "name": f"forecast-n{length}-m{period}-c{conc}",
+                    "endpoint": "/forecast",
+                    "length": length,
+                    "period": period,
+                    "concurrency": conc,
+                    "horizon": args.horizon,
+                })
+    scenarios.append({
+        "name": f"forecast-cached-n{args.lengths[-1]}-c{args.concurrency[-1]}",
+        "endpoint": "/forecast",
+        "length": args.lengths[-1],
+        "period": args.periods[0],
+        "concurrency": args.concurrency[-1],
+        "horizon": args.horizon,
+        "cached": True,
+    })
+    if args.batch:
+        scenarios.append({
+            "name": f"batch-{args.batch}-n{args.lengths[0]}-m{args.periods[0]}",
+            "endpoint": "/forecast/batch",
+            "length": args.lengths[0],
+            "period": args.periods[0],
+            "concurrency": 1,
+            "horizon": args.horizon,
+            "batch": args.batch,
+        })
+    return scenarios
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages for scenarios present in both runs."""
+    base = {s["name"]: s for s in baseline.get("scenarios", [])}
+    regressions = []
+    for s in results["scenarios"]:
+        b = base.get(s["name"])
+        if not b:
+            continue
+        p95, bp95 = s["latency_ms"]["p95"], b["latency_ms"]["p95"]
+        if bp95 and p95 > bp95 * (1 + tolerance):
+            regressions.append(f"{s['name']}: p95 {bp95:.1f}ms -> {p95:.1f}ms")
+        tput, btput = s["throughput_rps"], b["throughput_rps"]
+        if btput and tput is not None and tput < btput * (1 - tolerance):
+            regressions.append(f"{s['name']}: throughput {btput:.2f} -> {tput:.2f} req/s")
+    return regressions
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(port, workers):
+    env = dict(os.environ)
+    if workers:
+        env["FORECAST_WORKERS"] = str(workers)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=HERE,
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1):
+                return proc
+        except Exception:
+            if proc.poll() is not None:
+                raise SystemExit("uvicorn exited during startup")
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("uvicorn did not become healthy within 30s")
+
+
+def int_list(s):
+    return [int(x) for x in s.split(",") if x.strip()]
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark the forecast service")
+    p.add_argument("--url", default=None, help="Base URL of a running service")
+    p.add_argument("--spawn", action="store_true", help="Start a local uvicorn for the run")
+    p.add_argument("--workers", type=int, default=0, help="FORECAST_WORKERS for --spawn")
+    p.add_argument("--lengths", type=int_list, default=[60, 365, 1095])
+    p.add_argument("--periods", type=int_list, default=[7, 12, 52])
+    p.add_argument("--concurrency", type=int_list, default=[1, 4, 16])
+    p.add_argument("--requests", type=int, default=40, help="Requests per scenario")
+    p.add_argument("--horizon", type=int, default=14)
+    p.add_argument("--batch", type=int, default=32, help="Series per /forecast/batch request (0 to skip)")
+    p.add_argument("--timeout", type=float, default=120)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--out", default="bench-results.json")
+    p.add_argument("--baseline", default=None, help="Previous results JSON to compare against")
+    p.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    args = p.parse_args(argv)
+
+    if not args.url and not args.spawn:
+        p.error("give --url or --spawn")
+
+    proc = None
+    server_pid = None
+    base_url = args.url
+    if args.spawn:
+        port = free_port()
+        proc = spawn_server(port, args.workers)
+        server_pid = proc.pid
+        base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        scenarios = []
+        for idx, sc in enumerate(build_matrix(args)):
+            # distinct seeds per scenario so one scenario never hits another's cached fits
+            seed = (args.seed * 1000 + idx) * 100000
+            res = run_scenario(base_url, sc, args.requests, args.timeout, server_pid, seed)
+            lat = res["latency_ms"]
+            rss = f" rss={res['peak_rss_mb']:.0f}MB" if res["peak_rss_mb"] else ""
+            print(
+                f"[BENCH] {res['name']}: p50={lat['p50']:.1f}ms p95={lat['p95']:.1f}ms p99={lat['p99']:.1f}ms "
+                f"rps={res['throughput_rps']:.2f} ok={res['ok']}/{res['requests']}{rss}"
+            )
+            scenarios.append(res)
+        try:
+            with urllib.request.urlopen(base_url.rstrip("/") + "/healthz", timeout=5) as resp:
+                health = json.loads(resp.read().decode("utf-8"))
+        except Exception:
+            health = None
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "target": base_url,
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items() if k not in ("url", "out", "baseline")},
+        "server": health,
+        "scenarios": scenarios,
+    }
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[OK] wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            for r in regressions:
+                print(f"[REGRESSION] {r}")
+            sys.exit(1)
+        print(f"[OK] no regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
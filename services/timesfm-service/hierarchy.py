@@ -0,0 +1,69 @@
+"""Hierarchy construction and forecast reconciliation (pure NumPy).
+
+A hierarchy is given by the bottom series' paths, e.g.
+["tenant-a", "USNYC-CNSHA", "40HC"]. Every path prefix is a node; the
+empty prefix is the grand total. S is the summing matrix mapping bottom
+series to all nodes, so coherent forecasts satisfy y_all = S @ y_bottom.
+"""
+import numpy as np
+
+METHODS = ("bottom_up", "ols", "wls_struct")
+
+
+def summing_matrix(paths):
+    """Return (nodes, S, bottom_rows) for equal-depth, unique `paths`.
+
+    nodes is a list of path tuples, top-down and level by level in first-seen
+    order; S has one row per node and one column per path; bottom_rows[j] is
+    the node row of paths[j]. Raises ValueError on ragged or duplicate paths.
+    """
+    paths = [tuple(p) for p in paths]
+    depths = {len(p) for p in paths}
+    if len(depths) != 1 or 0 in depths:
+        raise ValueError("All series paths must be non-empty and have the same depth")
+    if len(set(paths)) != len(paths):
+        raise ValueError("Series paths must be unique")
+    depth = depths.pop()
+    nodes = []
+    index = {}
+    for d in range(depth + 1):
+        for p in paths:
+            prefix = p[:d]
+            if prefix not in index:
+                index[prefix] = len(nodes)
+                nodes.append(prefix)
+    S = np.zeros((len(nodes), len(paths)))
+    for j, p in enumerate(paths):
+        for d in range(depth + 1):
+            S[index[p[:d]], j] = 1.0
+    bottom_rows = np.array([index[p] for p in paths])
+    return nodes, S, bottom_rows
+
+
+def aggregate(S, bottom):
+    """Sum bottom-level arrays (one row per bottom series) up to every node."""
+    return S @ bottom
+
+
+def reconcile(S, base, method="bottom_up", bottom_rows=None):
+    """Coherent forecasts for every node from base forecasts.
+
+    bottom_up: `base` holds only the bottom rows (n_bottom x h), summed up.
+    ols / wls_struct: `base` has one row per node (n_nodes x h) and is projected
+    with the MinT-style estimator S (S' W^-1 S)^-1 S' W^-1, where W is the
+    identity (ols) or diag of the number of bottom series under each node
+    (wls_struct, structural scaling, which needs no residual covariance).
+    """
+    if method == "bottom_up":
+        if bottom_rows is not None and base.shape[0] == S.shape[0]:
+            base = base[bottom_rows]
+        return S @ base
+    if method == "ols":
+        w_inv = np.ones(S.shape[0])
+    elif method == "wls_struct":
+        w_inv = 1.0 / S.sum(axis=1)
+    else:
+        raise ValueError(f"Unknown reconciliation method '{method}'; expected one of {', '.join(METHODS)}")
+    StW = S.T * w_inv
+    G = np.linalg.solve(StW @ S, StW)
+    return S @ (G @ base)
@@ -0,0 +1,79 @@
+"""Prometheus metrics and per-stage request timing for the forecast service.
+
+Stage durations feed the `forecast_stage_seconds` histogram and, through
+StageTimer.header(), an optional Server-Timing response header. Cache, series
+state and pool counters are read at scrape time by StatsCollector.
+"""
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Stages: parse (body read + validation), decode (arrays from the request),
+# queue (waiting for a pool worker), fit (inside the worker), forecast (point +
+# interval output), serialize (JSON encoding of the response)
+
+REQUESTS = Counter("forecast_requests_total", "HTTP requests by endpoint and status code", ["endpoint", "status"])
+ERRORS = Counter("forecast_errors_total", "Failed forecasts by endpoint and error type", ["endpoint", "type"])
+STAGE_SECONDS = Histogram(
+    "forecast_stage_seconds",
+    "Time spent per processing stage",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+SERIES_LENGTH = Histogram(
+    "forecast_series_length",
+    "Points per input series",
+    buckets=(10, 30, 60, 120, 250, 365, 730, 1500, 3000, 10000),
+)
+FITS = Counter("forecast_fits_total", "Forecasts by fit mode (cached/incremental/full) and model", ["mode", "model"])
+
+
+class StageTimer:
+    """Stage durations for one request or batch item."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        STAGE_SECONDS.labels(name).observe(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def header(self):
+        return ", ".join(f"{name};dur={secs * 1000:.2f}" for name, secs in self.stages.items())
+
+
+class StatsCollector:
+    """Exposes `stats()` dicts (cache, series state, pool) as metrics at scrape time.
+
+    `sources` maps a metric prefix to (stats_fn, counter_keys, gauge_keys).
+    """
+
+    def __init__(self, sources):
+        self.sources = sources
+
+    def collect(self):
+        for prefix, (stats_fn, counters, gauges) in self.sources.items():
+            stats = stats_fn()
+            for key in counters:
+                m = CounterMetricFamily(f"{prefix}_{key}", f"{prefix} {key}")
+                m.add_metric([], stats[key])
+                yield m
+            for key in gauges:
+                m = GaugeMetricFamily(f"{prefix}_{key}", f"{prefix} {key}")
+                m.add_metric([], stats[key])
+                yield m
+
+    @classmethod
+    def register(cls, sources, registry=REGISTRY):
+        collector = cls(sources)
+        registry.register(collector)
+        return collector
@@ -0,0 +1,321 @@
+"""Forecast model registry and rolling-origin model selection.
+
+Every model exposes `min_points(m)` and `fit(y, m)`; `fit` returns an object
+with `forecast(h) -> np.ndarray` and `intervals(h, levels)`, which maps each
+level label ("80", "95") to (lower, upper) arrays using only the fitted state. Fitted objects are module-level classes so
+they pickle between the worker pool and the parent's model cache.
+"""
+import warnings
+import numpy as np
+from scipy.stats import norm
+from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+# Seasonal period to use when the request does not give one, by pandas freq prefix
+DEFAULT_PERIODS = {"H": 24, "D": 7, "B": 5, "W": 52, "M": 12, "MS": 12, "ME": 12, "Q": 4, "QS": 4, "QE": 4}
+
+
+def default_period(freq):
+    """Seasonal period for a pandas freq string; 1 (no season) for yearly and
+    any other unmapped frequency, which leaves the seasonal models out."""
+    if not freq:
+        return 7
+    base = freq.split("-")[0].lstrip("0123456789").upper()
+    return DEFAULT_PERIODS.get(base, 1)
+
+
+class InsufficientHistory(ValueError):
+    """The requested model needs more points than the series has."""
+
+
+def residual_sigma(resid):
+    resid = np.asarray(resid, dtype=np.float64)
+    resid = resid[np.isfinite(resid)]
+    return float(resid.std(ddof=1)) if len(resid) > 1 else 0.0
+
+
+def parse_levels(levels):
+    """Coverage levels as fractions; accepts 0-1 or percentages (80, 95)."""
+    out = []
+    for lv in levels or ():
+        frac = lv / 100.0 if lv > 1 else float(lv)
+        if not 0 < frac < 1:
+            raise ValueError(f"Invalid interval level {lv}; expected 0-1 or 0-100")
+        out.append(frac)
+    return out
+
+
+def level_label(frac):
+    return f"{frac * 100:g}"
+
+
+class GaussianIntervals:
+    """Intervals from a closed-form h-step forecast variance and normal quantiles."""
+
+    def variance(self, h):
+        raise NotImplementedError
+
+    def intervals(self, h, levels):
+        point = self.forecast(h)
+        sd = np.sqrt(self.variance(h))
+        out = {}
+        for frac in levels:
+            z = norm.ppf(0.5 + frac / 2)
+            out[level_label(frac)] = (point - z * sd, point + z * sd)
+        return out
+
+
+class ConstantForecast(GaussianIntervals):
+    """Flat forecast. `growing` gives random-walk variance (naive); otherwise
+    the variance of a `window`-point mean is used (moving average)."""
+
+    params = None
+
+    def __init__(self, level, sigma=0.0, growing=True, window=1):
+        self.level = float(level)
+        self.sigma = sigma
+        self.growing = growing
+        self.window = window
+
+    def forecast(self, h):
+        return np.full(h, self.level)
+
+    def variance(self, h):
+        if self.growing:
+            return self.sigma ** 2 * np.arange(1, h + 1)
+        return np.full(h, self.sigma ** 2 * (1 + 1 / self.window))
+
+
+class SeasonalForecast(GaussianIntervals):
+    params = None
+
+    def __init__(self, last_cycle, sigma=0.0):
+        self.last_cycle = np.asarray(last_cycle, dtype=np.float64)
+        self.sigma = sigma
+
+    def forecast(self, h):
+        return np.resize(self.last_cycle, h)
+
+    def variance(self, h):
+        cycles = np.arange(h) // len(self.last_cycle) + 1
+        return self.sigma ** 2 * cycles
+
+
+class StatsmodelsForecast:
+    """Wraps a fitted ExponentialSmoothing; intervals come from simulating the
+    fitted state space forward with its own residual variance (no refit)."""
+
+    def __init__(self, fit):
+        self.fit = fit
+
+    @property
+    def params(self):
+        """Smoothing parameters and initial states, enough to replay the fit on a longer series."""
+        p = self.fit.params
+        return {
+            "smoothing_level": float(p["smoothing_level"]),
+            "smoothing_trend": float(p["smoothing_trend"]),
+            "smoothing_seasonal": float(p["smoothing_seasonal"]),
+            "initial_level": float(p["initial_level"]),
+            "initial_trend": float(p["initial_trend"]),
+            "initial_seasons": np.asarray(p["initial_seasons"], dtype=np.float64).tolist(),
+        }
+
+    def forecast(self, h):
+        return np.asarray(self.fit.forecast(h), dtype=np.float64)
+
+    def intervals(self, h, levels, repetitions=1000):
+        kwargs = dict(anchor="end", repetitions=repetitions, error="add")
+        try:
+            sims = self.fit.simulate(h, rng=np.random.default_rng(0), **kwargs)
+        except TypeError:
+            # statsmodels < 0.15 names the seed argument random_state
+            sims = self.fit.simulate(h, random_state=0, **kwargs)
+        sims = np.asarray(sims, dtype=np.float64).reshape(h, -1)
+        out = {}
+        for frac in levels:
+            lower, upper = np.quantile(sims, [0.5 - frac / 2, 0.5 + frac / 2], axis=1)
+            out[level_label(frac)] = (lower, upper)
+        return out
+
+
+class NaiveModel:
+    name = "naive"
+
+    def min_points(self, m):
+        return 1
+
+    def fit(self, y, m, params=None):
+        return ConstantForecast(y[-1], residual_sigma(np.diff(y)))
+
+
+class SeasonalNaiveModel:
+    name = "seasonal_naive"
+
+    def min_points(self, m):
+        return m + 1 if m >= 2 else None
+
+    def fit(self, y, m, params=None):
+        return SeasonalForecast(y[-m:], residual_sigma(y[m:] - y[:-m]))
+
+
+class MovingAverageModel:
+    """Flat mean of the last `window` points (what container-demand falls back to)."""
+
+    name = "moving_average"
+
+    def __init__(self, window=6):
+        self.window = window
+
+    def min_points(self, m):
+        return 2
+
+    def fit(self, y, m, params=None):
+        k = min(self.window, len(y) - 1)
+        csum = np.concatenate(([0.0], np.cumsum(y)))
+        # One-step errors of the trailing k-point mean
+        resid = y[k:] - (csum[k:-1] - csum[:-k - 1]) / k
+        return ConstantForecast(np.mean(y[-self.window:]), residual_sigma(resid), growing=False, window=k)
+
+
+class ExponentialSmoothingModel:
+    def __init__(self, name, trend=None, seasonal=None):
+        self.name = name
+        self.trend = trend
+        self.seasonal = seasonal
+
+    def min_points(self, m):
+        if self.seasonal:
+            # statsmodels needs two full cycles to estimate the seasonal state
+            return 2 * m + 2 if m >= 2 else None
+        return 4 if self.trend else 3
+
+    def fit(self, y, m, params=None):
+        """Optimize on y, or with `params` from an earlier fit, replay those
+        smoothing parameters and initial states over y without optimizing."""
+        seasonal_periods = m if self.seasonal else None
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            if params is None:
+                model = ExponentialSmoothing(
+                    y,
+                    trend=self.trend,
+                    seasonal=self.seasonal,
+                    seasonal_periods=seasonal_periods,
+                    initialization_method="estimated",
+                )
+                return StatsmodelsForecast(model.fit(optimized=True))
+            initial = {"initial_level": params["initial_level"]}
+            smoothing = {"smoothing_level": params["smoothing_level"]}
+            if self.trend:
+                initial["initial_trend"] = params["initial_trend"]
+                smoothing["smoothing_trend"] = params["smoothing_trend"]
+            if self.seasonal:
+                initial["initial_seasonal"] = params["initial_seasons"]
+                smoothing["smoothing_seasonal"] = params["smoothing_seasonal"]
+            model = ExponentialSmoothing(
+                y,
+                trend=self.trend,
+                seasonal=self.seasonal,
+                seasonal_periods=seasonal_periods,
+                initialization_method="known",
+                **initial,
+            )
+            return StatsmodelsForecast(model.fit(optimized=False, **smoothing))
+
+
+def build_models(trend="add", seasonal="add"):
+    """Registry in cost order, cheapest first; `trend`/`seasonal` configure Holt-Winters."""
+    return {
+        "naive": NaiveModel(),
+        "seasonal_naive": SeasonalNaiveModel(),
+        "moving_average": MovingAverageModel(),
+        "ses": ExponentialSmoothingModel("ses"),
+        "holt": ExponentialSmoothingModel("holt", trend="add"),
+        "holt_winters": ExponentialSmoothingModel("holt_winters", trend=trend, seasonal=seasonal or "add"),
+    }
+
+
+MODEL_NAMES = tuple(build_models())
+
+
+def backtest(model, y, m, h, folds, give_up_at=np.inf):
+    """Mean absolute error over `folds` rolling origins, each forecasting `h` steps.
+
+    Origins are the last `folds` non-overlapping windows of y. Stops early and
+    returns inf once the accumulated error can no longer beat `give_up_at`.
+    """
+    need = model.min_points(m)
+    total = 0.0
+    used = 0
+    for k in range(folds, 0, -1):
+        cut = len(y) - k * h
+        if need is None or cut < need:
+            continue
+        try:
+            pred = model.fit(y[:cut], m).forecast(h)
+        except Exception:
+            return np.inf
+        actual = y[cut:cut + h]
+        total += float(np.abs(pred[:len(actual)] - actual).mean())
+        used += 1
+        if total / folds > give_up_at:
+            return np.inf
+    return total / used if used else np.inf
+
+
+def select_model(y, m, trend="add", seasonal="add", folds=3, candidates=None):
+    """Pick the model with the lowest rolling-origin backtest error.
+
+    Each origin forecasts one seasonal cycle (or less on short series), so the
+    choice does not depend on the request horizon and fits stay cacheable.
+    Candidates are tried cheapest first. Each one stops early once it cannot
+    beat the best score so far, and the search ends as soon as a model
+    backtests with zero error. Returns (name, scores).
+    """
+    models = build_models(trend, seasonal)
+    names = [n for n in (candidates or MODEL_NAMES) if n in models]
+    h = max(1, min(max(m, 1), len(y) // (folds + 1)))
+    best_name, best = None, np.inf
+    scores = {}
+    for name in names:
+        score = backtest(models[name], y, m, h, folds, give_up_at=best)
+        scores[name] = None if np.isinf(score) else score
+        if score < best:
+            best_name, best = name, score
+            if best <= 1e-12:
+                break
+    return best_name or "naive", scores
+
+
+def fit_series(y, m, model="auto", trend="add", seasonal="add", folds=3, warm=None):
+    """Fit the requested model (or the auto-selected one) on the full series.
+
+    Returns (name, fitted). With model="auto", a candidate that fails on the
+    full series falls back to the next best, ending at naive. `warm` is
+    {"model", "params"} from an earlier fit of a prefix of y: that model is
+    reused without selection and its parameters are replayed, not re-optimized.
+    """
+    models = build_models(trend, seasonal)
+    if warm is not None:
+        return warm["model"], models[warm["model"]].fit(y, m, params=warm["params"])
+    if model != "auto":
+        if model not in models:
+            raise ValueError(f"Unknown model '{model}'; expected auto or one of {', '.join(MODEL_NAMES)}")
+        need = models[model].min_points(m)
+        if need is None or len(y) < need:
+            raise InsufficientHistory(
+                f"{model} needs at least {need} points for seasonal period {m}" if need
+                else f"{model} needs a seasonal period of at least 2"
+            )
+        return model, models[model].fit(y, m)
+    _, scores = select_model(y, m, trend, seasonal, folds)
+    ranked = sorted((s, MODEL_NAMES.index(n), n) for n, s in scores.items() if s is not None)
+    for _, _, name in ranked:
+        need = models[name].min_points(m)
+        if need is None or len(y) < need:
+            continue
+        try:
+            return name, models[name].fit(y, m)
+        except Exception:
+            continue
+    return "naive", models["naive"].fit(y, m)
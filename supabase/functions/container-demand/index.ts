@@ -63,6 +63,7 @@ serveWithLogger(async (req, logger, supabaseAdmin) => {
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({ series, horizon: weeks }),
         });
+        logger.info("TimesFM forecast timing", { status: res.status, serverTiming: res.headers.get("server-timing") });
         if (res.ok) {
           const json = await res.json();
           forecast = json.forecast ?? [];
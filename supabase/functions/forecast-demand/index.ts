@@ -123,6 +123,7 @@ serveWithLogger(async (req, logger, supabase) => {
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ series, horizon }),
       });
+      logger.info("Forecast service timing", { status: svcRes.status, serverTiming: svcRes.headers.get("server-timing") });
       if (!svcRes.ok) {
         const t = await svcRes.text();
         throw new Error(`Service error: ${t}`);
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Microbenchmark: legacy transform_row + allow-list filter vs RowTransformer.
+
+Usage:
+  python helpers/bench_transform.py [table] [--rows N] [--repeat R]
+
+Rows are synthesized from the table's column-mappings.json entry, so no CSV
+or network access is needed. Outputs of both paths are compared before timing.
+"""
+import os
+import sys
+import time
+import argparse
+import importlib.util
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+def load_import_module():
+    path = os.path.join(BASE_DIR, 'import-rest.py')
+    spec = importlib.util.spec_from_file_location("import_rest", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+def synth_rows(cfg, n):
+    srcs = list((cfg.get("map") or {}).keys())
+    fk_srcs = [r.get("from") for r in (cfg.get("derive_fk") or {}).values() if r.get("from")]
+    extra = ["id", "name", "code", "created_at", "tenant_id", "notes"]
+    cols = list(dict.fromkeys(srcs + fk_srcs + extra))
+    rows = []
+    for i in range(n):
+        row = {c: f"{c}-{i % 50}" for c in cols}
+        row["name"] = f"{20 + (i % 3) * 20}' Standard"
+        row["code"] = f"{20 + (i % 3) * 20}GP"
+        rows.append(row)
+    return rows
+
+def synth_lookups(cfg):
+    lookups = {}
+    for rule in (cfg.get("derive_fk") or {}).values():
+        lk = lookups.setdefault(rule.get("lookup_table"), {})
+        for i in range(50):
+            lk[f"{rule.get('from')}-{i}"] = f"00000000-0000-0000-0000-{i:012d}"
+    return lookups
+
+def timed(fn, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for r in rows:
+            fn(r)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark per-row transform overhead")
+    p.add_argument("table", nargs="?", default="container_sizes")
+    p.add_argument("--rows", type=int, default=100000)
+    p.add_argument("--repeat", type=int, default=3)
+    args = p.parse_args(argv)
+
+    mod = load_import_module()
+    mappings = mod.load_mappings()
+    cfg = mappings.get(args.table) or {}
+    rows = synth_rows(cfg, args.rows)
+    lookups = synth_lookups(cfg)
+    # Allow-list as import_table builds it without OpenAPI: mapped/derived/set columns plus a few carried ones
+    allowed = set((cfg.get("map") or {}).values()) | set((cfg.get("derive_fk") or {}).keys())
+    allowed |= set((cfg.get("set") or {}).keys()) | {"id", "name", "code", "size_feet"}
+
+    def legacy(row):
+        tr = mod.transform_row(args.table, row, mappings, lookups)
+        return {k: v for k, v in tr.items() if (not allowed or k in allowed)}
+
+    compiled = mod.RowTransformer(args.table, mappings, lookups, allowed)
+    mismatches = sum(1 for r in rows if legacy(r) != compiled(r))
+    if mismatches:
+        print(f"[FAIL] {args.table}: {mismatches} rows differ between legacy and compiled transforms")
+        sys.exit(1)
+
+    t_legacy = timed(legacy, rows, args.repeat)
+    t_compiled = timed(compiled, rows, args.repeat)
+    print(f"table={args.table} rows={args.rows} columns={len(rows[0]) if rows else 0}")
+    print(f"legacy   : {args.rows / t_legacy:,.0f} rows/s ({t_legacy:.3f}s)")
+    print(f"compiled : {args.rows / t_compiled:,.0f} rows/s ({t_compiled:.3f}s)")
+    print(f"speedup  : {t_legacy / t_compiled:.2f}x")
+
+if __name__ == "__main__":
+    main()
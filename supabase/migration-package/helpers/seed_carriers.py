@@ -1,15 +1,14 @@
 #!/usr/bin/env python3
 import os
+import sys
 import csv
-import json
-import ssl
-from urllib import request, error
+from itertools import islice
+from urllib import error
 
-CSV_PATH = os.path.join(os.getcwd(), "supabase/migration-package/migration-data/carriers.csv")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rest_client import get_client  # noqa: E402
 
-def http_ctx():
-    allow_insecure = os.environ.get("ALLOW_INSECURE_SSL", "false").lower() == "true"
-    return ssl._create_unverified_context() if allow_insecure else ssl.create_default_context()
+CSV_PATH = os.path.join(os.getcwd(), "supabase/migration-package/migration-data/carriers.csv")
 
 def load_env():
     base_url = os.environ.get("NEW_SUPABASE_URL")
@@ -20,40 +19,22 @@ def load_env():
     return base_url.rstrip('/'), apikey, service_key
 
 def get_or_create_default_tenant(base_url, apikey, service_key):
+    client = get_client(base_url, apikey, service_key)
     # Try fetch by slug
-    url = f"{base_url}/rest/v1/tenants?slug=eq.default&select=id&limit=1"
-    headers = {
-        'Accept': 'application/json',
-        'apikey': apikey or service_key,
-        'Authorization': f'Bearer {service_key}',
-    }
-    req = request.Request(url, method='GET', headers=headers)
-    with request.urlopen(req, timeout=30, context=http_ctx()) as resp:
-        data = json.loads(resp.read().decode('utf-8'))
-        if data:
-            return data[0]['id']
+    data = client.get_json('tenants?slug=eq.default&select=id&limit=1', timeout=30)
+    if data:
+        return data[0]['id']
     # Create if missing
-    url = f"{base_url}/rest/v1/tenants"
-    payload = json.dumps([{ 'name': 'Default Tenant', 'slug': 'default', 'domain': None, 'is_active': True }]).encode('utf-8')
-    headers = {
-        'Content-Type': 'application/json',
-        'Accept': 'application/json',
-        'apikey': apikey or service_key,
-        'Authorization': f'Bearer {service_key}',
-        'Prefer': 'return=representation',
-    }
-    req = request.Request(url, data=payload, method='POST', headers=headers)
-    with request.urlopen(req, timeout=60, context=http_ctx()) as resp:
-        data = json.loads(resp.read().decode('utf-8'))
-        return data[0]['id'] if data else None
+    payload = [{ 'name': 'Default Tenant', 'slug': 'default', 'domain': None, 'is_active': True }]
+    headers = client.headers(prefer='return=representation', content_type='application/json')
+    data = client.request('POST', 'tenants', body=payload, headers=headers, timeout=60).json()
+    return data[0]['id'] if data else None
 
 def read_rows(path):
-    rows = []
+    # Generator: one row in memory at a time
     with open(path, newline='') as f:
-        r = csv.DictReader(f)
-        for row in r:
-            rows.append(row)
-    return rows
+        for row in csv.DictReader(f):
+            yield row
 
 def clean_row(r, default_tenant_id: str | None):
     # Drop ID to let DB generate, null tenant_id to avoid FK mismatch
@@ -81,8 +62,8 @@ def clean_row(r, default_tenant_id: str | None):
     return r
 
 def dedupe(rows):
+    # Generator: only the dedupe keys are retained
     seen = set()
-    out = []
     for r in rows:
         key = (
             r.get('carrier_name'),
@@ -94,26 +75,20 @@ def dedupe(rows):
         if key in seen:
             continue
         seen.add(key)
-        out.append(r)
-    return out
+        yield r
 
 def post_rows(base_url, apikey, service_key, table, rows):
-    url = f"{base_url}/rest/v1/{table}"
-    payload = json.dumps(rows).encode('utf-8')
-    headers = {
-        'Content-Type': 'application/json',
-        'Accept': 'application/json',
-        'apikey': apikey or service_key,
-        'Authorization': f'Bearer {service_key}',
-        'Prefer': 'return=minimal',
-    }
-    req = request.Request(url, data=payload, method='POST', headers=headers)
-    with request.urlopen(req, timeout=120, context=http_ctx()) as resp:
-        return resp.getcode()
+    client = get_client(base_url, apikey, service_key)
+    headers = client.headers(prefer='return=minimal', content_type='application/json')
+    return client.request('POST', table, body=rows, headers=headers, timeout=120).status
 
-def chunked(seq, size):
-    for i in range(0, len(seq), size):
-        yield seq[i:i+size]
+def chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
 
 def main():
     base_url, apikey, service_key = load_env()
@@ -123,17 +98,12 @@ def main():
         print(f"[ERROR] Missing carriers.csv at {CSV_PATH}")
         return 1
 
-    raw = read_rows(CSV_PATH)
-    cleaned = [clean_row(r, default_tenant_id) for r in raw]
-    cleaned = dedupe(cleaned)
-
-    total = len(cleaned)
-    if total == 0:
-        print("[WARN] No carriers to import after cleaning/dedupe")
-        return 0
+    cleaned = dedupe(clean_row(r, default_tenant_id) for r in read_rows(CSV_PATH))
 
+    total = 0
     imported = 0
     for batch in chunked(cleaned, 200):
+        total += len(batch)
         try:
             post_rows(base_url, apikey, service_key, 'carriers', batch)
             imported += len(batch)
@@ -143,6 +113,9 @@ def main():
         except Exception as e:
             print(f"[WARN] Batch import error: {e}")
 
+    if total == 0:
+        print("[WARN] No carriers to import after cleaning/dedupe")
+        return 0
     print(f"[OK] Imported carriers: {imported}/{total}")
     return 0
 
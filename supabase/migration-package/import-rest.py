@@ -4,10 +4,16 @@ import sys
 import csv
 import json
 import time
-from urllib import request, error, parse
-import ssl
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib import error, parse
 import re
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from rest_client import get_client  # noqa: E402
+
 
 TABLES = [
     # Master/config tables first (no heavy relationships)
@@ -119,6 +125,103 @@ def topo_sort_tables(tables, dependencies):
     return ordered
 
 
+def table_parents(tables, dependencies):
+    known = set(tables)
+    return {t: {p for p in (dependencies or {}).get(t, []) if p in known and p != t} for t in tables}
+
+
+def topo_levels(tables, dependencies):
+    # Level 0 has no parents among `tables`; level n only depends on earlier levels.
+    # Tables caught in a cycle are appended as a final level in original order.
+    parents = table_parents(tables, dependencies)
+    placed = set()
+    levels = []
+    remaining = list(tables)
+    while remaining:
+        level = [t for t in remaining if parents[t] <= placed]
+        if not level:
+            levels.append(remaining)
+            break
+        levels.append(level)
+        placed.update(level)
+        remaining = [t for t in remaining if t not in placed]
+    return levels
+
+
+def run_table_dag(tables, dependencies, run_table, max_parallel=1):
+    """Run run_table(t) for every table as soon as all of its parents have finished.
+
+    Ready tables start in `tables` order, up to max_parallel at a time.
+    Returns (results_by_table, timings) with timings[t] = (start, end) monotonic seconds.
+    """
+    parents = table_parents(tables, dependencies)
+    max_parallel = max(1, int(max_parallel or 1))
+    pending = list(tables)
+    finished = set()
+    running = {}
+    results = {}
+    timings = {}
+
+    def timed(t):
+        start = time.monotonic()
+        try:
+            return run_table(t)
+        finally:
+            timings[t] = (start, time.monotonic())
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        while pending or running:
+            ready = [t for t in pending if parents[t] <= finished]
+            if not ready and not running:
+                print(f"[WARN] Dependency cycle among {pending}; running {pending[0]} next")
+                ready = [pending[0]]
+            for t in ready[:max_parallel - len(running)]:
+                pending.remove(t)
+                running[pool.submit(timed, t)] = t
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                t = running.pop(fut)
+                results[t] = fut.result()
+                finished.add(t)
+    return results, timings
+
+
+def report_schedule(levels, dependencies, timings):
+    if not timings:
+        return
+    t0 = min(start for start, _ in timings.values())
+    t1 = max(end for _, end in timings.values())
+    for i, level in enumerate(levels):
+        spans = [timings[t] for t in level if t in timings]
+        if not spans:
+            continue
+        slowest = max((t for t in level if t in timings), key=lambda t: timings[t][1] - timings[t][0])
+        wall = max(e for _, e in spans) - min(s for s, _ in spans)
+        busy = sum(e - s for s, e in spans)
+        print(f"[TIMING] level {i}: tables={len(spans)} wall={wall:.1f}s busy={busy:.1f}s "
+              f"slowest={slowest} ({timings[slowest][1] - timings[slowest][0]:.1f}s)")
+    # Critical path: the dependency chain with the largest summed table durations
+    parents = table_parents([t for level in levels for t in level], dependencies)
+    finish = {}
+    prev = {}
+    for level in levels:
+        for t in level:
+            if t not in timings:
+                continue
+            ps = [p for p in parents[t] if p in finish]
+            best = max(ps, key=lambda p: finish[p]) if ps else None
+            finish[t] = (timings[t][1] - timings[t][0]) + (finish[best] if best else 0.0)
+            prev[t] = best
+    node = max(finish, key=finish.get)
+    path = []
+    while node:
+        path.append(node)
+        node = prev[node]
+    chain = " -> ".join(f"{t} ({timings[t][1] - timings[t][0]:.1f}s)" for t in reversed(path))
+    print(f"[TIMING] critical path {finish[path[0]]:.1f}s: {chain}")
+    print(f"[TIMING] total wall {t1 - t0:.1f}s")
+
+
 def load_env():
     base_url = os.environ.get("NEW_SUPABASE_URL")
     anon_key = os.environ.get("NEW_SUPABASE_ANON_KEY")
@@ -132,6 +235,42 @@ def load_env():
     return base_url.rstrip('/'), anon_key or service_key, service_key, data_dir
 
 
+def env_int(name, default):
+    raw = os.environ.get(name)
+    try:
+        return int(raw) if raw else default
+    except Exception:
+        return default
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Import migration-data CSVs into Supabase via PostgREST")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=env_int("IMPORT_CONCURRENCY", 1),
+        help="Max in-flight chunk POSTs per table (default: IMPORT_CONCURRENCY or 1)",
+    )
+    parser.add_argument(
+        "--parallel-tables",
+        type=int,
+        default=env_int("IMPORT_TABLE_PARALLELISM", 1),
+        help="Max tables imported at once; a table starts when all FK parents finish "
+             "(default: IMPORT_TABLE_PARALLELISM or 1)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=os.environ.get("IMPORT_CHECKPOINT", "import-checkpoint.jsonl"),
+        help="Checkpoint journal path (default: IMPORT_CHECKPOINT or ./import-checkpoint.jsonl)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip tables and chunks acknowledged in the checkpoint journal",
+    )
+    return parser.parse_args(argv)
+
+
 def sanitize_cell(value):
     if value is None:
         return None
@@ -149,58 +288,153 @@ def sanitize_cell(value):
     return value
 
 
+def iter_csv_rows(csv_path, start_offset=0):
+    """Yield (row, byte_offset) for each CSV record in one streaming pass.
+
+    byte_offset is the file position just past the record, so callers can
+    report progress against os.path.getsize() without a counting pre-pass,
+    and pass it back as start_offset to resume right after that record.
+    """
+    with open(csv_path, "rb") as f:
+        pos = 0
+
+        def lines():
+            nonlocal pos
+            for raw in f:
+                pos += len(raw)
+                yield raw.decode("utf-8")
+
+        reader = csv.DictReader(lines())
+        # Consume the header before seeking past already-imported records
+        reader.fieldnames
+        if start_offset > pos:
+            f.seek(start_offset)
+            pos = start_offset
+        for row in reader:
+            yield row, pos
+
+
 def to_json_rows(csv_path):
-    rows = []
-    with open(csv_path, newline='') as f:
-        r = csv.DictReader(f)
-        for row in r:
-            clean = {}
-            for k, v in row.items():
-                clean[k] = sanitize_cell(v)
-            rows.append(clean)
-    return rows
-
-
-def post_rows(base_url, apikey, service_key, table, rows, on_conflict=None):
-    url = f"{base_url}/rest/v1/{table}"
+    # Generator: sanitized rows, one at a time
+    for row, _ in iter_csv_rows(csv_path):
+        yield {k: sanitize_cell(v) for k, v in row.items()}
+
+
+def iter_chunks(csv_path, chunk_size, start_offset=0, batcher=None):
+    """Yield (sanitized_rows, byte_offset) chunks of at most chunk_size rows.
+
+    With a batcher, each chunk is cut at batcher.next_rows() rows or
+    batcher.max_csv_bytes of CSV input, whichever comes first.
+    """
+    chunk = []
+    offset = start_offset
+    chunk_start = start_offset
+    limit = batcher.next_rows() if batcher else chunk_size
+    for row, offset in iter_csv_rows(csv_path, start_offset):
+        chunk.append({k: sanitize_cell(v) for k, v in row.items()})
+        if len(chunk) >= limit or (batcher and offset - chunk_start >= batcher.max_csv_bytes):
+            yield chunk, offset
+            chunk = []
+            chunk_start = offset
+            limit = batcher.next_rows() if batcher else chunk_size
+    if chunk:
+        yield chunk, offset
+
+
+class AdaptiveBatcher:
+    """Picks rows per chunk from observed request latency and payload size.
+
+    Grows the batch (x1.5) while requests finish well under target_seconds,
+    trims it (x0.7) when they run over, and halves it on 413, 5xx or a
+    timeout/transport error; after a 413 it never grows past 3/4 of the
+    rejected size again. Rows per chunk are also capped so that the average CSV
+    bytes per row times rows stays under max_csv_bytes (CSV input, not the
+    JSON body). low/high track the range `rows` has taken.
+    """
+
+    def __init__(self, initial_rows, min_rows=10, max_rows=5000, max_csv_bytes=2_000_000, target_seconds=2.0):
+        self.min_rows = max(1, min_rows)
+        self.max_rows = max(self.min_rows, max_rows)
+        self.max_csv_bytes = max_csv_bytes
+        self.target_seconds = target_seconds
+        self.row_bytes = None
+        self.low = self.high = None
+        self._set_rows(initial_rows)
+        self.lock = threading.Lock()
+
+    def _set_rows(self, rows):
+        self.rows = max(self.min_rows, min(rows, self.max_rows))
+        self.low = self.rows if self.low is None else min(self.low, self.rows)
+        self.high = self.rows if self.high is None else max(self.high, self.rows)
+
+    @classmethod
+    def from_env(cls, initial_rows):
+        return cls(
+            initial_rows,
+            min_rows=env_int("IMPORT_BATCH_MIN", 10),
+            max_rows=env_int("IMPORT_BATCH_MAX", 5000),
+            max_csv_bytes=env_int("IMPORT_BATCH_MAX_CSV_BYTES", 2_000_000),
+            target_seconds=float(os.environ.get("IMPORT_BATCH_TARGET_SECONDS") or 2.0),
+        )
+
+    def next_rows(self):
+        with self.lock:
+            rows = self.rows
+            if self.row_bytes:
+                rows = min(rows, int(self.max_csv_bytes / self.row_bytes))
+            return max(self.min_rows, min(rows, self.max_rows))
+
+    def observe(self, rows, nbytes, seconds, code):
+        if not rows:
+            return
+        with self.lock:
+            if nbytes:
+                per_row = nbytes / rows
+                self.row_bytes = per_row if self.row_bytes is None else 0.7 * self.row_bytes + 0.3 * per_row
+            if code == 413:
+                # Never grow back to a size the server rejected as too large
+                self.max_rows = max(self.min_rows, min(self.max_rows, int(rows * 0.75)))
+                factor = 0.5
+            elif code is None or (isinstance(code, int) and code >= 500):
+                factor = 0.5
+            elif seconds > self.target_seconds:
+                factor = 0.7
+            elif seconds < self.target_seconds / 2 and rows >= self.rows:
+                factor = 1.5
+            else:
+                return
+            self._set_rows(int(self.rows * factor))
+
+
+def log_progress(table, idx, offset, size, started, batch_duration, start_offset=0):
+    # ETA from bytes consumed so far; rows per byte is roughly constant within a table
+    elapsed = time.monotonic() - started
+    if offset > start_offset and size:
+        eta_seconds = elapsed * max(size - offset, 0) / (offset - start_offset)
+        pct = 100.0 * offset / size
+        print(f"[INFO] {table}: chunk {idx} {pct:.0f}% duration={batch_duration:.2f}s eta={eta_seconds:.1f}s")
+    else:
+        print(f"[INFO] {table}: chunk {idx} duration={batch_duration:.2f}s")
+
+
+def post_rows(base_url, apikey, service_key, table, rows, on_conflict=None, resolution="ignore-duplicates"):
+    client = get_client(base_url, apikey, service_key)
+    path = table
     if on_conflict:
         # Accept list or comma-separated string
         if isinstance(on_conflict, (list, tuple)):
             oc = ",".join(on_conflict)
         else:
             oc = str(on_conflict)
-        url = f"{url}?on_conflict={parse.quote(oc)}"
+        path = f"{path}?on_conflict={parse.quote(oc)}"
     payload = json.dumps(rows).encode("utf-8")
     # Prefer header should only include resolution when on_conflict is provided
-    prefer = "return=minimal,resolution=ignore-duplicates" if on_conflict else "return=minimal"
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        # apikey can be anon or service; Authorization must be service
-        "apikey": apikey or service_key,
-        "Authorization": f"Bearer {service_key}",
-        # Keep minimal return for speed; add resolution only with on_conflict
-        "Prefer": prefer
-    }
-    req = request.Request(url, data=payload, method="POST", headers=headers)
-    # SSL context: optionally allow insecure for environments missing CA bundles
-    allow_insecure = os.environ.get("ALLOW_INSECURE_SSL", "false").lower() == "true"
-    try:
-        if allow_insecure:
-            ctx = ssl._create_unverified_context()
-        else:
-            ctx = ssl.create_default_context()
-    except Exception:
-        ctx = None
-
+    # Keep minimal return for speed; add resolution only with on_conflict
+    prefer = f"return=minimal,resolution={resolution}" if on_conflict else "return=minimal"
+    headers = client.headers(prefer=prefer, content_type="application/json")
     try:
-        if ctx is not None:
-            resp = request.urlopen(req, timeout=60, context=ctx)
-        else:
-            resp = request.urlopen(req, timeout=60)
-        with resp:
-            code = resp.getcode()
-            return True, code, None
+        resp = client.request("POST", path, body=payload, headers=headers, timeout=60)
+        return True, resp.status, None
     except error.HTTPError as e:
         try:
             body = e.read().decode("utf-8")
@@ -211,15 +445,15 @@ def post_rows(base_url, apikey, service_key, table, rows, on_conflict=None):
         return False, None, str(e)
 
 
-def post_rows_with_retry(base_url, apikey, service_key, table, rows, on_conflict=None, max_retries=3):
+def post_rows_with_retry(base_url, apikey, service_key, table, rows, on_conflict=None, max_retries=3, resolution="ignore-duplicates"):
     attempt = 0
     last_code = None
     last_err = None
     while attempt < max_retries:
-        ok, code, err = post_rows(base_url, apikey, service_key, table, rows, on_conflict=on_conflict)
-        if ok and code in (201, 204):
+        ok, code, err = post_rows(base_url, apikey, service_key, table, rows, on_conflict=on_conflict, resolution=resolution)
+        if ok and code in (200, 201, 204):
             return True, code, err, attempt + 1
-        retryable = code is None or (isinstance(code, int) and code >= 500)
+        retryable = code is None or code == 429 or (isinstance(code, int) and code >= 500)
         if not retryable:
             return ok, code, err, attempt + 1
         attempt += 1
@@ -229,6 +463,84 @@ def post_rows_with_retry(base_url, apikey, service_key, table, rows, on_conflict
     return False, last_code, last_err, max_retries
 
 
+def bisect_post(base_url, apikey, service_key, table, rows, batch_index=None, operation="row",
+                on_conflict=None, resolution="ignore-duplicates", conflict_rows=None):
+    """Insert rows whose bulk POST already failed by splitting them in halves.
+
+    Halves that succeed are committed whole and failing halves are split
+    again, so a chunk of n rows with k bad rows costs O(k log n) requests
+    instead of n. Left halves are resolved first; when one turns out to be
+    all conflicts, its failing sibling is replayed row by row rather than
+    split further, so an all-conflict chunk (a rerun) costs about n requests,
+    not 2n. Every request goes through post_rows_with_retry with the caller's
+    on_conflict/resolution, so transient 5xx/timeouts are not mistaken for
+    bad rows.
+
+    Returns (inserted, conflicts, errors); each error names the exact failing
+    row. Conflicting rows are also appended to `conflict_rows` when given.
+    """
+    inserted = 0
+    conflicts = 0
+    errors = []
+
+    def post(part):
+        ok, code, err, _ = post_rows_with_retry(base_url, apikey, service_key, table, part,
+                                                on_conflict=on_conflict, resolution=resolution)
+        return ok and code in (200, 201, 204), code, err
+
+    def settle_row(row, code, err):
+        nonlocal conflicts
+        if code == 409:
+            conflicts += 1
+            if conflict_rows is not None:
+                conflict_rows.append(row)
+            return 1
+        errors.append({"chunk": batch_index, "operation": operation, "row_id": row.get("id"), "row": row, "code": code, "error": err})
+        return 0
+
+    def per_row(part):
+        nonlocal inserted
+        found = 0
+        for row in part:
+            ok, code, err = post([row])
+            if ok:
+                inserted += 1
+            else:
+                found += settle_row(row, code, err)
+        return found
+
+    def resolve(part, code, err):
+        # `part` failed as a whole; returns how many of its rows conflict
+        if len(part) == 1:
+            return settle_row(part[0], code, err)
+        mid = len(part) // 2
+        left, right = part[:mid], part[mid:]
+        found = send(left)
+        if found == len(left):
+            # Dense conflicts (typically a rerun): stop bisecting this part
+            ok, code, err = post(right)
+            if ok:
+                return found + commit(right)
+            return found + (per_row(right) if len(right) > 1 else settle_row(right[0], code, err))
+        return found + send(right)
+
+    def commit(part):
+        nonlocal inserted
+        inserted += len(part)
+        return 0
+
+    def send(part):
+        ok, code, err = post(part)
+        return commit(part) if ok else resolve(part, code, err)
+
+    if len(rows) == 1:
+        send(rows)
+    elif rows:
+        # The caller's bulk POST already failed, so start by splitting
+        resolve(rows, None, None)
+    return inserted, conflicts, errors
+
+
 def dedupe_rows(rows, key_fields=None):
     seen = set()
     out = []
@@ -246,17 +558,18 @@ def dedupe_rows(rows, key_fields=None):
 
 
 def fetch_openapi(base_url, apikey, service_key):
-    url = f"{base_url}/rest/v1/"
-    headers = {
-        "Accept": "application/openapi+json",
-        "apikey": apikey or service_key,
-        "Authorization": f"Bearer {service_key}",
-    }
-    req = request.Request(url, method="GET", headers=headers)
-    allow_insecure = os.environ.get("ALLOW_INSECURE_SSL", "false").lower() == "true"
-    ctx = ssl._create_unverified_context() if allow_insecure else ssl.create_default_context()
-    with request.urlopen(req, timeout=60, context=ctx) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+    client = get_client(base_url, apikey, service_key)
+    headers = client.headers(accept="application/openapi+json")
+    return client.request("GET", "", headers=headers, timeout=60).json()
+
+
+def filter_literal(v):
+    # Booleans and numbers as literals; None stays None (is.null)
+    if v is None:
+        return None
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    return str(v)
 
 
 def build_filter_query(params):
@@ -266,64 +579,186 @@ def build_filter_query(params):
         if v is None:
             parts.append(f"{parse.quote(k)}=is.null")
         else:
-            # Booleans and numbers as literals; strings url-encoded
-            if isinstance(v, bool):
-                lit = "true" if v else "false"
-            else:
-                lit = str(v)
-            parts.append(f"{parse.quote(k)}=eq.{parse.quote(lit)}")
+            # strings url-encoded
+            parts.append(f"{parse.quote(k)}=eq.{parse.quote(filter_literal(v))}")
     return "&".join(parts)
 
 
+def build_in_filter(field, values):
+    # PostgREST in.(...) list; double-quote every item so commas/parens in values are safe
+    items = []
+    for v in values:
+        lit = filter_literal(v).replace("\\", "\\\\").replace('"', '\\"')
+        items.append(f'"{lit}"')
+    return f"{parse.quote(field)}=in.({parse.quote(','.join(items))})"
+
+
+def group_by_columns(rows):
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row.keys()), []).append(row)
+    return list(groups.values())
+
+
+def match_key(row, match_on):
+    return tuple(filter_literal(row.get(k)) for k in match_on)
+
+
+def fetch_existing_keys(base_url, apikey, service_key, table, rows, match_on, max_values=200):
+    """Return the set of match_on key tuples (as filter literals) that already exist for `rows`.
+
+    Rows are grouped by every match_on column except a pivot column, so a chunk
+    sharing e.g. the same tenant_id costs one `pivot=in.(...)` GET per 200 keys
+    instead of one count query per row.
+    """
+    client = get_client(base_url, apikey, service_key)
+    keys = {match_key(r, match_on) for r in rows}
+    # Pivot on the column with the most distinct values in this chunk
+    pivot_pos = max(range(len(match_on)), key=lambda i: len({k[i] for k in keys}))
+    pivot = match_on[pivot_pos]
+    groups = {}
+    for k in keys:
+        rest = tuple(v for i, v in enumerate(k) if i != pivot_pos)
+        groups.setdefault(rest, set()).add(k[pivot_pos])
+    select = ",".join(match_on)
+    existing = set()
+    for rest, pivot_values in groups.items():
+        others = {c: v for c, v in zip([c for c in match_on if c != pivot], rest)}
+        base_q = build_filter_query(others)
+        queries = []
+        if None in pivot_values:
+            queries.append(build_filter_query({pivot: None}))
+            pivot_values.discard(None)
+        values = sorted(pivot_values)
+        for i in range(0, len(values), max_values):
+            queries.append(build_in_filter(pivot, values[i:i + max_values]))
+        for q in queries:
+            filters = "&".join(part for part in (base_q, q) if part)
+            data = client.get_json(f"{table}?select={select}&{filters}", timeout=60) or []
+            for d in data:
+                existing.add(match_key(d, match_on))
+    return existing
+
+
+def upsert_chunk(base_url, apikey, service_key, table, chunk, match_on, state):
+    """Existence-aware upsert of one chunk: one key prefetch, grouped merges, bulk inserts.
+
+    The server decides which rows exist. Rows whose match_on columns are all
+    non-null go through one merge-duplicates POST per column layout. The key
+    prefetch only splits the reported count into inserted and updated. Rows
+    with a NULL key column, or every row once the table turns out to have
+    no matching unique constraint, are bulk-inserted. Rows the prefetch
+    found, or that the insert rejects with 409, are then updated by per-row
+    PATCH. A 409 therefore means "already exists", not a conflict.
+    """
+    inserted = 0
+    updated = 0
+    errors = []
+    try:
+        existing = fetch_existing_keys(base_url, apikey, service_key, table, chunk, match_on)
+    except Exception as e:
+        print(f"[WARN] {table}: key prefetch failed ({e}); checking rows individually")
+        existing = {match_key(r, match_on) for r in chunk
+                    if rest_count(base_url, apikey, service_key, table, {k: r.get(k) for k in match_on}) > 0}
+
+    # NULL key columns never match ON CONFLICT, so those rows skip the merge.
+    # Last write wins for repeated keys, as with sequential PATCHes.
+    rest = []
+    mergeable = {}
+    for row in chunk:
+        key = match_key(row, match_on)
+        if None in key:
+            rest.append(row)
+        else:
+            mergeable[key] = row
+    for group in group_by_columns(list(mergeable.values())):
+        if not state.get("merge_supported", True):
+            rest.extend(group)
+            continue
+        ok, code, err, _ = post_rows_with_retry(base_url, apikey, service_key, table, group,
+                                                on_conflict=match_on, resolution="merge-duplicates")
+        if ok and code in (200, 201, 204):
+            found = sum(1 for r in group if match_key(r, match_on) in existing)
+            updated += found
+            inserted += len(group) - found
+        elif code == 409:
+            # Conflict on another unique constraint; settle this group row by row
+            rest.extend(group)
+        else:
+            print(f"[WARN] {table}: grouped upsert unavailable (code={code}); falling back to insert + per-row PATCH")
+            state["merge_supported"] = False
+            rest.extend(group)
+
+    inserts = []
+    patch_rows_list = []
+    seen_new = set()
+    for row in rest:
+        key = match_key(row, match_on)
+        if key in existing or key in seen_new:
+            patch_rows_list.append(row)
+        else:
+            seen_new.add(key)
+            inserts.append(row)
+
+    # Bulk payloads need identical keys, and derived fields may be absent on some rows
+    for group in group_by_columns(inserts):
+        ok, code, err, _ = post_rows_with_retry(base_url, apikey, service_key, table, group, on_conflict=None)
+        if ok and code in (201, 204):
+            inserted += len(group)
+        else:
+            if code == 409:
+                print(f"[WARN] {table}: bulk insert conflict; bisecting...")
+            # Rows the server already has (the prefetch can miss them when it
+            # formats a key differently) are updated instead
+            present = []
+            ins, _, errs = bisect_post(base_url, apikey, service_key, table, group, operation="insert",
+                                       conflict_rows=present)
+            inserted += ins
+            errors.extend(errs)
+            patch_rows_list.extend(present)
+
+    for row in patch_rows_list:
+        match_params = {k: row.get(k) for k in match_on}
+        ok, code, err = patch_rows(base_url, apikey, service_key, table, match_params, row)
+        if ok and code in (200, 204):
+            updated += 1
+        else:
+            errors.append({"row": row, "operation": "patch", "row_id": row.get("id"), "code": code, "error": err})
+    return {"inserted": inserted, "updated": updated, "conflicts": 0, "errors": errors}
+
+
 def rest_count(base_url, apikey, service_key, table, match_params):
+    client = get_client(base_url, apikey, service_key)
     q = build_filter_query(match_params)
-    url = f"{base_url}/rest/v1/{table}?{q}&select=id&limit=1"
-    headers = {
-        "Accept": "application/json",
-        "Prefer": "count=exact",
-        "apikey": apikey or service_key,
-        "Authorization": f"Bearer {service_key}",
-    }
-    req = request.Request(url, method="GET", headers=headers)
-    allow_insecure = os.environ.get("ALLOW_INSECURE_SSL", "false").lower() == "true"
-    ctx = ssl._create_unverified_context() if allow_insecure else ssl.create_default_context()
+    path = f"{table}?{q}&select=id&limit=1"
     try:
-        with request.urlopen(req, timeout=30, context=ctx) as resp:
-            cr = resp.headers.get("Content-Range")
-            total = None
-            if cr and "/" in cr:
-                try:
-                    total = int(cr.split("/")[-1])
-                except Exception:
-                    total = None
-            return total if total is not None else 0
+        resp = client.request("GET", path, headers=client.headers(prefer="count=exact"), timeout=30)
+        cr = resp.headers.get("Content-Range")
+        total = None
+        if cr and "/" in cr:
+            try:
+                total = int(cr.split("/")[-1])
+            except Exception:
+                total = None
+        return total if total is not None else 0
     except error.HTTPError as e:
         # Fallback on any 4xx/5xx error to avoid hard failure in upsert path
         try:
             body = e.read().decode("utf-8")
         except Exception:
             body = str(e)
-        print(f"[WARN] count query failed for {table}: {e.code} {body}. URL={url}")
+        print(f"[WARN] count query failed for {table}: {e.code} {body}. URL={client.url(path)}")
         return 0
 
 
 def patch_rows(base_url, apikey, service_key, table, match_params, payload):
+    client = get_client(base_url, apikey, service_key)
     q = build_filter_query(match_params)
-    url = f"{base_url}/rest/v1/{table}?{q}"
     body = json.dumps(payload).encode("utf-8")
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "Prefer": "return=minimal",
-        "apikey": apikey or service_key,
-        "Authorization": f"Bearer {service_key}",
-    }
-    req = request.Request(url, data=body, method="PATCH", headers=headers)
-    allow_insecure = os.environ.get("ALLOW_INSECURE_SSL", "false").lower() == "true"
-    ctx = ssl._create_unverified_context() if allow_insecure else ssl.create_default_context()
+    headers = client.headers(prefer="return=minimal", content_type="application/json")
     try:
-        with request.urlopen(req, timeout=60, context=ctx) as resp:
-            return True, resp.getcode(), None
+        resp = client.request("PATCH", f"{table}?{q}", body=body, headers=headers, timeout=60)
+        return True, resp.status, None
     except error.HTTPError as e:
         try:
             body = e.read().decode("utf-8")
@@ -358,7 +793,192 @@ def extract_table_columns(openapi_json):
     return columns_map
 
 
-def import_table(base_url, apikey, service_key, data_dir, table, table_columns, mapping_cfg, lookups):
+class CheckpointJournal:
+    """Append-only JSONL journal of acknowledged chunks and finished tables.
+
+    Each chunk line records table, chunk index, the CSV byte offset just past
+    the chunk and its outcome. Chunks are journaled in file order, so on
+    --resume a table continues from the offset of its last acknowledged chunk.
+    A chunk whose errors include a transport/5xx failure is "failed" and stops
+    the acknowledged prefix, so it is re-sent on resume; chunks with only
+    row-level 4xx errors are "errors" and are not retried. A table with a
+    failed chunk is not marked done.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = {}
+        self.acked = {}
+        self.blocked = set()
+        if resume:
+            self._load()
+        else:
+            open(path, "w").close()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    # Torn final line from a crash mid-write
+                    continue
+                table = rec.get("table")
+                if rec.get("outcome") == "done":
+                    self.done[table] = rec
+                elif rec.get("outcome") == "start":
+                    # A new attempt re-covers everything after its start offset
+                    self.blocked.discard(table)
+                    self.acked[table] = (rec["chunk"], rec["offset"])
+                elif table in self.blocked:
+                    continue
+                elif rec.get("outcome") == "failed":
+                    self.blocked.add(table)
+                else:
+                    self.acked[table] = (rec["chunk"], rec["offset"])
+
+    def _append(self, rec):
+        rec["ts"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(rec) + "\n")
+                f.flush()
+
+    def table_done(self, table):
+        return self.done.get(table)
+
+    def resume_point(self, table):
+        # (last acknowledged chunk index, byte offset past it)
+        return self.acked.get(table, (0, 0))
+
+    def begin_table(self, table):
+        chunk, offset = self.resume_point(table)
+        self.blocked.discard(table)
+        self._append({"table": table, "chunk": chunk, "offset": offset, "outcome": "start"})
+        return chunk, offset
+
+    def record_chunk(self, table, chunk, offset, res):
+        errs = res.get("errors") or []
+        if any(e.get("code") is None or (isinstance(e.get("code"), int) and e["code"] >= 500) for e in errs):
+            outcome = "failed"
+            with self.lock:
+                self.blocked.add(table)
+        else:
+            outcome = "errors" if errs else "ok"
+        self._append({
+            "table": table,
+            "chunk": chunk,
+            "offset": offset,
+            "outcome": outcome,
+            "inserted": res.get("inserted", 0),
+            "conflicts": res.get("conflicts", 0),
+            "errors": len(errs),
+        })
+
+    def record_table(self, table, res):
+        if table in self.blocked:
+            print(f"[WARN] {table}: not checkpointed as done; failed chunks will be re-sent on --resume")
+            return
+        self._append({
+            "table": table,
+            "outcome": "done",
+            "inserted": res.get("inserted", 0),
+            "conflicts": res.get("conflicts", 0),
+            "errors": len(res.get("errors") or []),
+        })
+
+
+def column_to_drop(err):
+    try:
+        m = re.search(r"Could not find the '([^']+)' column", str(err or ""))
+        if m:
+            return m.group(1)
+    except Exception:
+        pass
+    return None
+
+
+def upload_chunk(base_url, apikey, service_key, table, batch_index, chunk, on_conflict, state, nbytes=None):
+    # Posts one transformed chunk and applies the retry/fallback ladder:
+    # bulk POST -> bisect on 409 -> drop on_conflict on 42P10/42703 -> drop unknown column.
+    # Safe to run from worker threads; `state` (disable_on_conflict flag and an
+    # optional AdaptiveBatcher fed with nbytes/latency) is shared by the table's chunks.
+    inserted = 0
+    conflicts = 0
+    errors = []
+    if not chunk:
+        errors.append({"chunk": batch_index, "code": 400, "error": "No matching columns in payload"})
+        print(f"[ERROR] {table}: chunk {batch_index} has no matching columns; skipping")
+        return {"inserted": inserted, "conflicts": conflicts, "errors": errors}
+
+    def bisect(rows, oc):
+        nonlocal inserted, conflicts
+        ins, conf, errs = bisect_post(base_url, apikey, service_key, table, rows, batch_index, on_conflict=oc)
+        inserted += ins
+        conflicts += conf
+        errors.extend(errs)
+
+    def retry_without_column(err_in, code_in, oc):
+        nonlocal inserted
+        sample_id = chunk[0].get("id")
+        col_to_drop = column_to_drop(err_in)
+        if not col_to_drop:
+            errors.append({"chunk": batch_index, "operation": "bulk", "row_id": sample_id, "code": code_in, "error": err_in})
+            print(f"[ERROR] {table}: chunk {batch_index} failed code={code_in} err={err_in}")
+            return
+        reduced_chunk = []
+        for row in chunk:
+            r2 = dict(row)
+            r2.pop(col_to_drop, None)
+            reduced_chunk.append(r2)
+        ok4, code4, err4, _ = post_rows_with_retry(base_url, apikey, service_key, table, reduced_chunk, on_conflict=oc)
+        if ok4 and code4 in (201, 204):
+            inserted += len(reduced_chunk)
+        else:
+            errors.append({"chunk": batch_index, "operation": "bulk", "row_id": sample_id, "code": code4, "error": err4})
+            print(f"[ERROR] {table}: chunk {batch_index} failed code={code4} err={err4}")
+
+    oc = None if state["disable_on_conflict"] else on_conflict
+    started = time.monotonic()
+    ok, code, err, _ = post_rows_with_retry(base_url, apikey, service_key, table, chunk, on_conflict=oc)
+    batcher = state.get("batcher")
+    if batcher is not None:
+        batcher.observe(len(chunk), nbytes, time.monotonic() - started, code)
+    if ok and code in (201, 204):
+        inserted += len(chunk)
+    elif code == 413 and len(chunk) > 1:
+        # Payload too large: send the two halves independently
+        print(f"[WARN] {table}: chunk {batch_index} too large ({len(chunk)} rows); splitting")
+        mid = len(chunk) // 2
+        for half in (chunk[:mid], chunk[mid:]):
+            res = upload_chunk(base_url, apikey, service_key, table, batch_index, half, on_conflict, state)
+            inserted += res["inserted"]
+            conflicts += res["conflicts"]
+            errors.extend(res["errors"])
+    elif code == 409:
+        print(f"[WARN] {table}: bulk conflict on chunk {batch_index}. Bisecting...")
+        bisect(chunk, oc)
+        print(f"[INFO] {table}: bisection completed for chunk {batch_index}")
+    elif err and ("42P10" in str(err) or "42703" in str(err)) and oc:
+        print(f"[WARN] {table}: disabling on_conflict due to schema mismatch; retrying chunk bulk...")
+        state["disable_on_conflict"] = True
+        ok2, code2, err2, _ = post_rows_with_retry(base_url, apikey, service_key, table, chunk, on_conflict=None)
+        if ok2 and code2 in (201, 204):
+            inserted += len(chunk)
+        elif code2 == 409:
+            print(f"[WARN] {table}: conflict persists; bisecting...")
+            bisect(chunk, None)
+        else:
+            retry_without_column(err2, code2, None)
+    else:
+        retry_without_column(err, code, oc)
+    return {"inserted": inserted, "conflicts": conflicts, "errors": errors}
+
+
+def import_table(base_url, apikey, service_key, data_dir, table, table_columns, mapping_cfg, lookups, concurrency=1, journal=None):
     path = os.path.join(data_dir, f"{table}.csv")
     if not os.path.isfile(path):
         print(f"[SKIP] {table}: no CSV found")
@@ -369,22 +989,26 @@ def import_table(base_url, apikey, service_key, data_dir, table, table_columns,
         print(f"[SKIP] {table}: empty CSV")
         return {"table": table, "found": True, "empty": True}
 
-    rows = None
-    total = 0
-    with open(path, newline='') as f:
-        r = csv.DictReader(f)
-        for _ in r:
-            total += 1
-    if total == 0:
-        print(f"[SKIP] {table}: no data rows")
-        return {"table": table, "found": True, "empty": True}
+    first_chunk, start_offset = 0, 0
+    if journal is not None:
+        prev = journal.table_done(table)
+        if prev:
+            print(f"[SKIP] {table}: completed in a previous run (checkpoint)")
+            return {
+                "table": table,
+                "found": True,
+                "resumed": True,
+                "inserted": prev.get("inserted", 0),
+                "conflicts": prev.get("conflicts", 0),
+                "errors": [],
+            }
+        first_chunk, start_offset = journal.begin_table(table)
+        if start_offset:
+            print(f"[RESUME] {table}: continuing after chunk {first_chunk} at byte {start_offset}/{size}")
 
-    print(f"[INFO] {table}: {total} rows to insert")
-    chunk_size_env = os.environ.get("IMPORT_BATCH_SIZE")
-    try:
-        chunk_size = int(chunk_size_env) if chunk_size_env else 500
-    except Exception:
-        chunk_size = 500
+    print(f"[INFO] {table}: streaming {size} bytes")
+    chunk_size = env_int("IMPORT_BATCH_SIZE", 500)
+    concurrency = max(1, int(concurrency or 1))
     inserted = 0
     conflicts = 0
     errors = []
@@ -408,16 +1032,13 @@ def import_table(base_url, apikey, service_key, data_dir, table, table_columns,
     allowed_final = schema_allowed if (strict_guard and schema_allowed) else allowed_union
     # Debug logging for trimmed fields
     debug_trim = os.environ.get("LOG_TRIMMED_FIELDS", "false").lower() == "true"
-    trimmed_keys = set()
-
-    # Allow disabling on_conflict dynamically if schema doesn't support it
-    disable_on_conflict = False
+    # Mapping config, lookups and allow-list are resolved once per table, not per row
+    transform = RowTransformer(table, mapping_cfg, lookups, allowed_final)
+    trimmed_keys = transform.trimmed
 
-    # If match_on provided, perform existence-aware upsert per-row
+    # If match_on provided, perform batched existence-aware upsert
     match_on = cfg.get("match_on")
     if match_on:
-        rows = to_json_rows(path)
-        total = len(rows)
         # Validate match_on against allowed set
         allowed = allowed_final
         valid_match_on = [k for k in match_on if (not allowed or k in allowed)]
@@ -425,261 +1046,120 @@ def import_table(base_url, apikey, service_key, data_dir, table, table_columns,
             print(f"[WARN] table {table}: match_on keys not in schema; falling back to insert-only.")
         else:
             match_on = valid_match_on
-            for r in rows:
-                tr = transform_row(table, r, mapping_cfg, lookups)
-                # Filter allowed columns
-                allowed = allowed_final
-                filtered = {k: v for k, v in tr.items() if (not allowed or k in allowed)}
-                if debug_trim:
-                    for k in tr.keys():
-                        if (allowed and k not in allowed):
-                            trimmed_keys.add(k)
-                if not filtered:
+            updated = 0
+            upsert_state = {}
+            total = 0
+            start_table = time.monotonic()
+            chunks = iter_chunks(path, chunk_size, start_offset)
+            for idx, (chunk_raw, offset) in enumerate(chunks, start=first_chunk + 1):
+                batch_start = time.monotonic()
+                total += len(chunk_raw)
+                # transform + filter allowed columns
+                chunk = [r for r in map(transform, chunk_raw) if r]
+                if not chunk:
                     continue
-                match_params = {k: filtered.get(k) for k in match_on}
-                count = rest_count(base_url, apikey, service_key, table, match_params)
-                if count and count > 0:
-                    ok, code, err = patch_rows(base_url, apikey, service_key, table, match_params, filtered)
-                    if ok and code in (200, 204):
-                        # treat updates as inserted for reporting consistency
-                        inserted += 1
-                    else:
-                        errors.append({"row": filtered, "operation": "patch", "row_id": filtered.get("id"), "code": code, "error": err})
-                else:
-                    ok, code, err = post_rows(base_url, apikey, service_key, table, [filtered], on_conflict=None)
-                    if ok and code in (201, 204):
-                        inserted += 1
-                    elif code == 409:
-                        conflicts += 1
-                    else:
-                        errors.append({"row": filtered, "operation": "insert", "row_id": filtered.get("id"), "code": code, "error": err})
-            print(f"[DONE] {table}: inserted/updated={inserted} conflicts={conflicts} errors={len(errors)}")
+                res = upsert_chunk(base_url, apikey, service_key, table, chunk, match_on, upsert_state)
+                # treat updates as inserted for reporting consistency
+                inserted += res["inserted"] + res["updated"]
+                updated += res["updated"]
+                conflicts += res["conflicts"]
+                errors.extend(res["errors"])
+                if journal is not None:
+                    journal.record_chunk(table, idx, offset, res)
+                log_progress(table, idx, offset, size, start_table, time.monotonic() - batch_start, start_offset)
+            if total == 0 and not start_offset:
+                print(f"[SKIP] {table}: no data rows")
+                return {"table": table, "found": True, "empty": True}
+            print(f"[DONE] {table}: inserted/updated={inserted} (updated={updated}) conflicts={conflicts} errors={len(errors)}")
             if debug_trim and trimmed_keys:
                 print(f"[DEBUG] {table}: trimmed fields due to guard -> {sorted(trimmed_keys)}")
-            return {
+            result = {
                 "table": table,
                 "found": True,
                 "inserted": inserted,
                 "conflicts": conflicts,
                 "errors": errors,
             }
+            if journal is not None:
+                journal.record_table(table, result)
+            return result
 
-    processed = 0
-    total_batches = (total + chunk_size - 1) // chunk_size
-    batch_index = 0
+    total = 0
     start_table = time.monotonic()
-    with open(path, newline='') as f:
-        r = csv.DictReader(f)
-        chunk_raw = []
-        for raw_row in r:
-            norm_row = {k: sanitize_cell(v) for k, v in raw_row.items()}
-            chunk_raw.append(norm_row)
-            if len(chunk_raw) >= chunk_size:
-                batch_index += 1
-                batch_start = time.monotonic()
-                allowed = allowed_final
-                chunk = []
-                for row in chunk_raw:
-                    tr = transform_row(table, row, mapping_cfg, lookups)
-                    filtered = {k: v for k, v in tr.items() if (not allowed or k in allowed)}
-                    if debug_trim:
-                        for k in tr.keys():
-                            if (allowed and k not in allowed):
-                                trimmed_keys.add(k)
-                    if filtered:
-                        chunk.append(filtered)
-                if chunk:
-                    chunk = dedupe_rows(chunk, key_fields=dedupe_key)
-                if not chunk:
-                    errors.append({"chunk": batch_index, "code": 400, "error": "No matching columns in payload"})
-                    print(f"[ERROR] {table}: chunk {batch_index} has no matching columns; skipping")
-                else:
-                    oc = None if disable_on_conflict else on_conflict
-                    ok, code, err, _ = post_rows_with_retry(base_url, apikey, service_key, table, chunk, on_conflict=oc)
-                    if ok and code in (201, 204):
-                        inserted += len(chunk)
-                    else:
-                        if code == 409:
-                            print(f"[WARN] {table}: bulk conflict on chunk {batch_index}. Retrying per-row...")
-                            for row in chunk:
-                                ok1, code1, err1 = post_rows(base_url, apikey, service_key, table, [row], on_conflict=None)
-                                if ok1 and code1 in (201, 204):
-                                    inserted += 1
-                                elif code1 == 409:
-                                    conflicts += 1
-                                else:
-                                    errors.append({"chunk": batch_index, "operation": "row", "row_id": row.get("id"), "code": code1, "error": err1})
-                            print(f"[INFO] {table}: per-row retry completed for chunk {batch_index}")
-                        else:
-                            if err and ("42P10" in str(err) or "42703" in str(err)) and not disable_on_conflict and on_conflict:
-                                print(f"[WARN] {table}: disabling on_conflict due to schema mismatch; retrying chunk bulk...")
-                                disable_on_conflict = True
-                                ok2, code2, err2, _ = post_rows_with_retry(base_url, apikey, service_key, table, chunk, on_conflict=None)
-                                if ok2 and code2 in (201, 204):
-                                    inserted += len(chunk)
-                                elif code2 == 409:
-                                    print(f"[WARN] {table}: conflict persists; retrying per-row...")
-                                    for row in chunk:
-                                        ok3, code3, err3 = post_rows(base_url, apikey, service_key, table, [row], on_conflict=None)
-                                        if ok3 and code3 in (201, 204):
-                                            inserted += 1
-                                        elif code3 == 409:
-                                            conflicts += 1
-                                        else:
-                                            errors.append({"chunk": batch_index, "code": code3, "error": err3})
-                                else:
-                                    sample_id = None
-                                    try:
-                                        sample_id = chunk[0].get("id")
-                                    except Exception:
-                                        pass
-                                    col_to_drop = None
-                                    try:
-                                        msg = str(err2 or "")
-                                        m = re.search(r"Could not find the '([^']+)' column", msg)
-                                        if m:
-                                            col_to_drop = m.group(1)
-                                    except Exception:
-                                        pass
-                                    if col_to_drop:
-                                        reduced_chunk = []
-                                        for row in chunk:
-                                            r2 = dict(row)
-                                            r2.pop(col_to_drop, None)
-                                            reduced_chunk.append(r2)
-                                        ok4, code4, err4, _ = post_rows_with_retry(base_url, apikey, service_key, table, reduced_chunk, on_conflict=oc)
-                                        if ok4 and code4 in (201, 204):
-                                            inserted += len(reduced_chunk)
-                                        else:
-                                            errors.append({"chunk": batch_index, "operation": "bulk", "row_id": sample_id, "code": code4, "error": err4})
-                                    else:
-                                        errors.append({"chunk": batch_index, "operation": "bulk", "row_id": sample_id, "code": code2, "error": err2})
-                            else:
-                                sample_id = None
-                                try:
-                                    sample_id = chunk[0].get("id")
-                                except Exception:
-                                    pass
-                                col_to_drop = None
-                                try:
-                                    msg = str(err or "")
-                                    m = re.search(r"Could not find the '([^']+)' column", msg)
-                                    if m:
-                                        col_to_drop = m.group(1)
-                                except Exception:
-                                    pass
-                                if col_to_drop:
-                                    reduced_chunk = []
-                                    for row in chunk:
-                                        r2 = dict(row)
-                                        r2.pop(col_to_drop, None)
-                                        reduced_chunk.append(r2)
-                                    ok5, code5, err5, _ = post_rows_with_retry(base_url, apikey, service_key, table, reduced_chunk, on_conflict=oc)
-                                    if ok5 and code5 in (201, 204):
-                                        inserted += len(reduced_chunk)
-                                    else:
-                                        errors.append({"chunk": batch_index, "operation": "bulk", "row_id": sample_id, "code": code5, "error": err5})
-                                        print(f"[ERROR] {table}: chunk {batch_index} failed code={code5} err={err5}")
-                                else:
-                                    errors.append({"chunk": batch_index, "operation": "bulk", "row_id": sample_id, "code": code, "error": err})
-                                    print(f"[ERROR] {table}: chunk {batch_index} failed code={code} err={err}")
-                processed += len(chunk_raw)
-                batch_duration = time.monotonic() - batch_start
-                if processed and total:
-                    remaining = max(total - processed, 0)
-                    elapsed = time.monotonic() - start_table
-                    per_row = elapsed / processed
-                    eta_seconds = remaining * per_row
-                    print(f"[INFO] {table}: chunk {batch_index}/{total_batches} duration={batch_duration:.2f}s eta={eta_seconds:.1f}s")
-                else:
-                    print(f"[INFO] {table}: chunk {batch_index} duration={batch_duration:.2f}s")
-                chunk_raw = []
-        if chunk_raw:
-            batch_index += 1
-            batch_start = time.monotonic()
-            allowed = allowed_final
-            chunk = []
-            for row in chunk_raw:
-                tr = transform_row(table, row, mapping_cfg, lookups)
-                filtered = {k: v for k, v in tr.items() if (not allowed or k in allowed)}
-                if debug_trim:
-                    for k in tr.keys():
-                        if (allowed and k not in allowed):
-                            trimmed_keys.add(k)
-                if filtered:
-                    chunk.append(filtered)
-            if chunk:
-                chunk = dedupe_rows(chunk, key_fields=dedupe_key)
-            if not chunk:
-                errors.append({"chunk": batch_index, "code": 400, "error": "No matching columns in payload"})
-                print(f"[ERROR] {table}: chunk {batch_index} has no matching columns; skipping")
-            else:
-                oc = None if disable_on_conflict else on_conflict
-                ok, code, err, _ = post_rows_with_retry(base_url, apikey, service_key, table, chunk, on_conflict=oc)
-                if ok and code in (201, 204):
-                    inserted += len(chunk)
-                else:
-                    if code == 409:
-                        print(f"[WARN] {table}: bulk conflict on chunk {batch_index}. Retrying per-row...")
-                        for row in chunk:
-                            ok1, code1, err1 = post_rows(base_url, apikey, service_key, table, [row], on_conflict=None)
-                            if ok1 and code1 in (201, 204):
-                                inserted += 1
-                            elif code1 == 409:
-                                conflicts += 1
-                            else:
-                                errors.append({"chunk": batch_index, "operation": "row", "row_id": row.get("id"), "code": code1, "error": err1})
-                        print(f"[INFO] {table}: per-row retry completed for chunk {batch_index}")
-                    else:
-                        if err and ("42P10" in str(err) or "42703" in str(err)) and not disable_on_conflict and on_conflict:
-                            print(f"[WARN] {table}: disabling on_conflict due to schema mismatch; retrying chunk bulk...")
-                            disable_on_conflict = True
-                            ok2, code2, err2, _ = post_rows_with_retry(base_url, apikey, service_key, table, chunk, on_conflict=None)
-                            if ok2 and code2 in (201, 204):
-                                inserted += len(chunk)
-                            elif code2 == 409:
-                                print(f"[WARN] {table}: conflict persists; retrying per-row...")
-                                for row in chunk:
-                                    ok3, code3, err3 = post_rows(base_url, apikey, service_key, table, [row], on_conflict=None)
-                                    if ok3 and code3 in (201, 204):
-                                        inserted += 1
-                                    elif code3 == 409:
-                                        conflicts += 1
-                                    else:
-                                        errors.append({"chunk": batch_index, "code": code3, "error": err3})
-                        else:
-                            sample_id = None
-                            try:
-                                sample_id = chunk[0].get("id")
-                            except Exception:
-                                pass
-                            errors.append({"chunk": batch_index, "operation": "bulk", "row_id": sample_id, "code": code, "error": err})
-                            print(f"[ERROR] {table}: chunk {batch_index} failed code={code} err={err}")
-            processed += len(chunk_raw)
-            batch_duration = time.monotonic() - batch_start
-            if processed and total:
-                remaining = max(total - processed, 0)
-                elapsed = time.monotonic() - start_table
-                per_row = elapsed / processed
-                eta_seconds = remaining * per_row
-                print(f"[INFO] {table}: chunk {batch_index}/{total_batches} duration={batch_duration:.2f}s eta={eta_seconds:.1f}s")
-            else:
-                print(f"[INFO] {table}: chunk {batch_index} duration={batch_duration:.2f}s")
+    # Shared across workers: once a chunk detects that on_conflict is unsupported,
+    # subsequent chunks post without it.
+    state = {"disable_on_conflict": False}
+    adaptive = os.environ.get("IMPORT_ADAPTIVE_BATCH", "true").lower() == "true"
+    batcher = AdaptiveBatcher.from_env(chunk_size) if adaptive else None
+    state["batcher"] = batcher
+    # Entries are (batch_index, byte_offset, batch_start, future), oldest first,
+    # so results are reported in chunk order regardless of completion order.
+    in_flight = deque()
+
+    def prepare_chunk(chunk_raw):
+        chunk = [r for r in map(transform, chunk_raw) if r]
+        if chunk:
+            chunk = dedupe_rows(chunk, key_fields=dedupe_key)
+        return chunk
+
+    def collect(entry):
+        nonlocal inserted, conflicts
+        idx, offset, batch_start, future = entry
+        res = future.result()
+        inserted += res["inserted"]
+        conflicts += res["conflicts"]
+        errors.extend(res["errors"])
+        if journal is not None:
+            journal.record_chunk(table, idx, offset, res)
+        log_progress(table, idx, offset, size, start_table, time.monotonic() - batch_start, start_offset)
+
+    def submit(pool, idx, chunk_raw, offset, nbytes):
+        # Bound the number of in-flight POSTs; wait on the oldest chunk first.
+        while len(in_flight) >= concurrency:
+            collect(in_flight.popleft())
+        batch_start = time.monotonic()
+        chunk = prepare_chunk(chunk_raw)
+        future = pool.submit(upload_chunk, base_url, apikey, service_key, table, idx, chunk, on_conflict, state, nbytes)
+        in_flight.append((idx, offset, batch_start, future))
+
+    if concurrency > 1:
+        print(f"[INFO] {table}: uploading with concurrency={concurrency}")
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        prev_offset = start_offset
+        chunks = iter_chunks(path, chunk_size, start_offset, batcher=batcher)
+        for idx, (chunk_raw, offset) in enumerate(chunks, start=first_chunk + 1):
+            total += len(chunk_raw)
+            submit(pool, idx, chunk_raw, offset, offset - prev_offset)
+            prev_offset = offset
+        while in_flight:
+            collect(in_flight.popleft())
+    if total == 0 and not start_offset:
+        print(f"[SKIP] {table}: no data rows")
+        return {"table": table, "found": True, "empty": True}
+    if batcher is not None:
+        print(f"[INFO] {table}: adaptive batch rows final={batcher.rows} range={batcher.low}-{batcher.high}")
 
     print(f"[DONE] {table}: inserted={inserted} conflicts={conflicts} errors={len(errors)}")
     if debug_trim and trimmed_keys:
         print(f"[DEBUG] {table}: trimmed fields due to guard -> {sorted(trimmed_keys)}")
-    return {
+    result = {
         "table": table,
         "found": True,
         "inserted": inserted,
         "conflicts": conflicts,
         "errors": errors,
     }
+    if journal is not None:
+        journal.record_table(table, result)
+    return result
 
 
-def main():
+def main(argv=None):
+    args = parse_args(argv)
     base_url, apikey, service_key, data_dir = load_env()
+    journal = CheckpointJournal(args.checkpoint, resume=args.resume)
+    if args.resume:
+        print(f"[INFO] Resuming from checkpoint {args.checkpoint}: {len(journal.done)} table(s) already complete")
     mappings = load_mappings()
     try:
         openapi = fetch_openapi(base_url, apikey, service_key)
@@ -688,15 +1168,20 @@ def main():
         print(f"[WARN] Could not fetch OpenAPI schema: {e}. Proceeding without column filtering.")
         table_columns = {}
     # Assemble dependency graph from static map and mapping configuration
-    dep_map = dict(FK_DEPENDENCIES)
-    dep_map.update(collect_dependencies_from_mappings(mappings))
+    # Union both sources: derive_fk parents must not replace static FK parents
+    dep_map = {t: list(ps) for t, ps in FK_DEPENDENCIES.items()}
+    for child, parents in collect_dependencies_from_mappings(mappings).items():
+        dep_map[child] = sorted(set(dep_map.get(child, [])) | set(parents))
     ordered_tables = topo_sort_tables(TABLES, dep_map)
     print("[INFO] Insert order (FK-aware):", ", ".join(ordered_tables))
+    levels = topo_levels(ordered_tables, dep_map)
+    for i, level in enumerate(levels):
+        print(f"[INFO] Level {i}: {', '.join(level)}")
 
     # Lookups will be rebuilt per-table based on derive_fk needs, so that
     # parents inserted earlier are visible to children.
     lookups = {}
-    results = []
+    lookups_lock = threading.Lock()
     print("==========================================")
     print("REST Import: Master/Config Tables")
     print("==========================================")
@@ -721,10 +1206,16 @@ def main():
                     except Exception as e2:
                         print(f"[WARN] CSV fallback for {lk_table} lookup failed: {e2}")
 
-    for t in ordered_tables:
-        ensure_lookups_for_table(t)
-        res = import_table(base_url, apikey, service_key, data_dir, t, table_columns, mappings, lookups)
-        results.append(res)
+    def run_table(t):
+        with lookups_lock:
+            ensure_lookups_for_table(t)
+        return import_table(base_url, apikey, service_key, data_dir, t, table_columns, mappings, lookups, concurrency=args.concurrency, journal=journal)
+
+    if args.parallel_tables > 1:
+        print(f"[INFO] Importing up to {args.parallel_tables} independent tables at once")
+    results_by_table, timings = run_table_dag(ordered_tables, dep_map, run_table, args.parallel_tables)
+    results = [results_by_table[t] for t in ordered_tables]
+    report_schedule(levels, dep_map, timings)
 
     print("\nSummary:")
     for r in results:
@@ -734,6 +1225,9 @@ def main():
         if r.get("empty"):
             print(f"- {r['table']}: empty")
             continue
+        if r.get("resumed"):
+            print(f"- {r['table']}: completed in previous run inserted={r.get('inserted',0)} conflicts={r.get('conflicts',0)}")
+            continue
         print(f"- {r['table']}: inserted={r.get('inserted',0)} conflicts={r.get('conflicts',0)} errors={len(r.get('errors', []))}")
 
     # Detailed error preview per table (top 3)
@@ -786,33 +1280,86 @@ def derive_size_feet(row):
     return None
 
 
-def build_lookup(base_url, apikey, service_key, table, key_field, value_field):
-    url = f"{base_url}/rest/v1/{table}?select={key_field},{value_field}&limit=1000"
-    headers = {
-        "Accept": "application/json",
-        "apikey": apikey or service_key,
-        "Authorization": f"Bearer {service_key}",
-    }
-    req = request.Request(url, method="GET", headers=headers)
-    allow_insecure = os.environ.get("ALLOW_INSECURE_SSL", "false").lower() == "true"
-    ctx = ssl._create_unverified_context() if allow_insecure else ssl.create_default_context()
-    with request.urlopen(req, timeout=60, context=ctx) as resp:
-        data = json.loads(resp.read().decode("utf-8"))
-        # Build mapping value_field -> key_field (e.g., identifier -> id)
-        return {str(d.get(value_field)): d.get(key_field) for d in data if d.get(value_field) is not None}
+def lookup_stamp(base_url, apikey, service_key, table):
+    """Return "<max updated_at>|<row count>" for table, or None if it has no updated_at."""
+    client = get_client(base_url, apikey, service_key)
+    path = f"{table}?select=updated_at&order=updated_at.desc.nullslast&limit=1"
+    try:
+        resp = client.request("GET", path, headers=client.headers(prefer="count=exact"), timeout=30)
+    except error.HTTPError:
+        return None
+    data = resp.json() or []
+    cr = resp.headers.get("Content-Range") or ""
+    count = cr.split("/")[-1] if "/" in cr else "?"
+    latest = data[0].get("updated_at") if data else None
+    return f"{latest}|{count}"
+
+
+def lookup_cache_path(base_url, table, key_field, value_field):
+    cache_dir = os.environ.get("IMPORT_LOOKUP_CACHE_DIR") or os.path.join(os.getcwd(), ".lookup-cache")
+    host = re.sub(r"[^A-Za-z0-9]+", "_", parse.urlsplit(base_url).netloc)
+    return os.path.join(cache_dir, f"{host}.{table}.{value_field}.{key_field}.json")
+
+
+def build_lookup(base_url, apikey, service_key, table, key_field, value_field, page_size=1000):
+    """Map value_field -> key_field (e.g., identifier -> id) over every row of table.
+
+    Pages with keyset pagination on key_field (ordered, `gt.` the last key seen)
+    until an empty page, so results are complete whatever the server's
+    max-rows cap. The map is cached on disk per table, keyed by its
+    max(updated_at) and row count; reruns reuse it while the parent is unchanged.
+    """
+    client = get_client(base_url, apikey, service_key)
+    use_cache = os.environ.get("IMPORT_LOOKUP_CACHE", "true").lower() == "true"
+    stamp = lookup_stamp(base_url, apikey, service_key, table) if use_cache else None
+    cache_path = lookup_cache_path(base_url, table, key_field, value_field)
+    if stamp and os.path.isfile(cache_path):
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if cached.get("stamp") == stamp:
+                print(f"[INFO] {table}: lookup cache hit ({len(cached['map'])} keys)")
+                return cached["map"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    mapping = {}
+    last = None
+    while True:
+        path = f"{table}?select={key_field},{value_field}&order={key_field}.asc&limit={page_size}"
+        if last is not None:
+            path = f"{path}&{key_field}=gt.{parse.quote(filter_literal(last))}"
+        data = client.get_json(path, timeout=60) or []
+        if not data:
+            break
+        for d in data:
+            if d.get(value_field) is not None:
+                mapping[str(d.get(value_field))] = d.get(key_field)
+        last = data[-1].get(key_field)
+        if last is None:
+            break
+
+    if stamp:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp = f"{cache_path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"stamp": stamp, "map": mapping}, f)
+            os.replace(tmp, cache_path)
+        except OSError as e:
+            print(f"[WARN] {table}: could not write lookup cache: {e}")
+    return mapping
 
 def build_lookup_from_csv(data_dir, table, key_field, value_field):
     path = os.path.join(data_dir, f"{table}.csv")
     if not os.path.isfile(path):
         return {}
     mapping = {}
-    with open(path, newline='') as f:
-        r = csv.DictReader(f)
-        for row in r:
-            k = row.get(value_field)
-            v = row.get(key_field)
-            if k is not None and v is not None and str(k).strip():
-                mapping[str(k)] = v
+    for row, _ in iter_csv_rows(path):
+        k = row.get(value_field)
+        v = row.get(key_field)
+        if k is not None and v is not None and str(k).strip():
+            mapping[str(k)] = v
     return mapping
 
 
@@ -858,5 +1405,91 @@ def transform_row(table, row, mapping_cfg, lookups):
     return mapped
 
 
+SIZE_FEET_FIELDS = ("length_ft", "size_feet", "name", "size_name", "code", "size_code")
+
+
+class RowTransformer:
+    """transform_row + allow-list filtering, compiled once per table.
+
+    Produces the same output as
+    `{k: v for k, v in transform_row(...).items() if not allowed or k in allowed}`
+    but resolves the mapping config, lookups and allow-list up front. Per CSV
+    header layout it caches a plan of (output key, source key) pairs, so the
+    per-row work is one dict comprehension plus the derive/derive_fk rules
+    whose destination survives the filter. Keys dropped by the allow-list are
+    collected in `trimmed`.
+    """
+
+    def __init__(self, table, mapping_cfg, lookups, allowed=None):
+        cfg = mapping_cfg.get(table) or {}
+        self.allowed = set(allowed or ())
+        self.field_map = dict(cfg.get("map") or {})
+        self.map_dsts = {}
+        for src, dst in self.field_map.items():
+            self.map_dsts[dst] = src
+        self.derive_size = (cfg.get("derive") or {}).get("size_feet") == "from_name_or_code"
+        self.fk_rules = []
+        self.fk_trimmed = []
+        for dst, rule in (cfg.get("derive_fk") or {}).items():
+            lookup = lookups.get(rule.get("lookup_table"))
+            if not lookup:
+                continue
+            aliases = {str(k): str(v) for k, v in (rule.get("aliases") or {}).items() if v is not None}
+            entry = (dst, rule.get("from"), aliases, lookup)
+            (self.fk_rules if self.keep(dst) else self.fk_trimmed).append(entry)
+        self.constants = [(k, v) for k, v in (cfg.get("set") or {}).items() if self.keep(k)]
+        self.trimmed = {k for k in (cfg.get("set") or {}) if not self.keep(k)}
+        self.plans = {}
+
+    def keep(self, key):
+        return not self.allowed or key in self.allowed
+
+    def source_of(self, key):
+        # Where transform_row's `mapped[key]` comes from: a mapped source column or the row itself
+        return self.map_dsts.get(key, key)
+
+    def plan(self, keys):
+        # Mapped destinations first, then carried-through columns, as in transform_row
+        pairs = [(dst, src) for dst, src in self.map_dsts.items()]
+        pairs += [(k, k) for k in keys if k not in self.map_dsts]
+        plan = [(out, src) for out, src in pairs if self.keep(out)]
+        self.trimmed.update(out for out, _ in pairs if not self.keep(out))
+        present = set(self.map_dsts) | set(keys)
+        size_sources = [(f, self.source_of(f)) for f in SIZE_FEET_FIELDS if f in present]
+        return plan, size_sources
+
+    def __call__(self, row):
+        keys = tuple(row)
+        compiled = self.plans.get(keys)
+        if compiled is None:
+            compiled = self.plans[keys] = self.plan(keys)
+        plan, size_sources = compiled
+        get = row.get
+        out = {dst: get(src) for dst, src in plan}
+        if self.derive_size:
+            sf = derive_size_feet({f: get(src) for f, src in size_sources})
+            if sf is not None:
+                if self.keep("size_feet"):
+                    out["size_feet"] = sf
+                else:
+                    self.trimmed.add("size_feet")
+        for dst, src_field, aliases, lookup in self.fk_rules:
+            src_val = get(src_field)
+            if src_val is not None and not out.get(dst):
+                key_val = str(src_val)
+                lk_val = lookup.get(aliases.get(key_val, key_val))
+                if lk_val is not None:
+                    out[dst] = lk_val
+        for dst, src_field, aliases, lookup in self.fk_trimmed:
+            src_val = get(src_field)
+            if src_val is not None and dst not in self.trimmed:
+                key_val = str(src_val)
+                if lookup.get(aliases.get(key_val, key_val)) is not None:
+                    self.trimmed.add(dst)
+        for k, v in self.constants:
+            out[k] = v
+        return out
+
+
 if __name__ == "__main__":
     main()
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 import os
+import sys
 import json
-import ssl
-from urllib import request, parse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from rest_client import get_client  # noqa: E402
 
 BASE_DIR = os.path.dirname(__file__)
 
@@ -26,22 +28,8 @@ def load_env():
     return url.rstrip('/'), key
 
 def get_json(base_url, key, path, params=None):
-    url = f"{base_url}/rest/v1/{path}"
-    if params:
-        qs = parse.urlencode(params, doseq=True)
-        url = f"{url}?{qs}"
-    headers = {
-        'Accept': 'application/json',
-        'apikey': key,
-        'Authorization': f'Bearer {key}',
-        'Prefer': 'count=exact'
-    }
-    req = request.Request(url, headers=headers)
-    allow_insecure = os.environ.get('ALLOW_INSECURE_SSL', 'false').lower() == 'true'
-    ctx = ssl._create_unverified_context() if allow_insecure else ssl.create_default_context()
-    with request.urlopen(req, context=ctx) as resp:
-        data = resp.read()
-        return json.loads(data.decode('utf-8'))
+    client = get_client(base_url, key, key)
+    return client.get_json(path, params, prefer='count=exact')
 
 def count_rows(base_url, key, table):
     # Use count via HEAD-like count param workaround: select=* and parse length
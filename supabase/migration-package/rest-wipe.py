@@ -2,8 +2,10 @@
 import os
 import sys
 import json
-from urllib import request, error
-import ssl
+from urllib import error
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from rest_client import get_client  # noqa: E402
 
 WIPE_TABLES = [
     # Delete children first to avoid FK issues
@@ -30,42 +32,30 @@ def load_env():
     return base_url.rstrip('/'), anon_key, service_key
 
 
-def http_ctx():
-    allow_insecure = os.environ.get("ALLOW_INSECURE_SSL", "false").lower() == "true"
-    return ssl._create_unverified_context() if allow_insecure else ssl.create_default_context()
-
-
-def headers(apikey, service_key):
-    return {
-        "Accept": "application/json",
-        "apikey": apikey or service_key,
-        "Authorization": f"Bearer {service_key}",
-        "Prefer": "return=minimal,count=exact",
-    }
+PREFER = "return=minimal,count=exact"
 
 
 def get_count(base_url, apikey, service_key, table):
-    url = f"{base_url}/rest/v1/{table}?select=id&limit=1"
-    req = request.Request(url, method="GET", headers=headers(apikey, service_key))
-    with request.urlopen(req, timeout=60, context=http_ctx()) as resp:
-        cr = resp.headers.get("Content-Range")
-        # Content-Range: 0-0/<total>
-        if cr and "/" in cr:
-            try:
-                total = int(cr.split("/")[-1])
-                return total
-            except Exception:
-                return None
-        return None
+    client = get_client(base_url, apikey, service_key)
+    resp = client.request("GET", f"{table}?select=id&limit=1", headers=client.headers(prefer=PREFER), timeout=60)
+    cr = resp.headers.get("Content-Range")
+    # Content-Range: 0-0/<total>
+    if cr and "/" in cr:
+        try:
+            total = int(cr.split("/")[-1])
+            return total
+        except Exception:
+            return None
+    return None
 
 
 def delete_all(base_url, apikey, service_key, table, filter_field="id"):
+    client = get_client(base_url, apikey, service_key)
     # Use a non-null filter to delete all rows
-    url = f"{base_url}/rest/v1/{table}?{filter_field}=is.not_null"
-    req = request.Request(url, method="DELETE", headers=headers(apikey, service_key))
+    path = f"{table}?{filter_field}=is.not_null"
     try:
-        with request.urlopen(req, timeout=60, context=http_ctx()) as resp:
-            return True, resp.getcode(), None
+        resp = client.request("DELETE", path, headers=client.headers(prefer=PREFER), timeout=60)
+        return True, resp.status, None
     except error.HTTPError as e:
         try:
             body = e.read().decode("utf-8")
@@ -78,15 +68,15 @@ def delete_all(base_url, apikey, service_key, table, filter_field="id"):
 
 def choose_filter_field(base_url, apikey, service_key, table):
     # Probe which common fields exist by attempting a GET with select
+    client = get_client(base_url, apikey, service_key)
     candidates = ["id", "code", "identifier", "name"]
     for fld in candidates:
-        url = f"{base_url}/rest/v1/{table}?select={fld}&limit=1"
-        req = request.Request(url, method="GET", headers=headers(apikey, service_key))
+        path = f"{table}?select={fld}&limit=1"
         try:
-            with request.urlopen(req, timeout=30, context=http_ctx()) as resp:
-                # If the response is 200, field is valid
-                if resp.getcode() == 200:
-                    return fld
+            resp = client.request("GET", path, headers=client.headers(prefer=PREFER), timeout=30)
+            # If the response is 200, field is valid
+            if resp.status == 200:
+                return fld
         except Exception:
             continue
     # Fallback to id
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Shared PostgREST client for the migration-package REST scripts.
+
+Keeps one pool of keep-alive connections per host and a single SSL context,
+so chunked imports do not pay a TCP+TLS handshake per request. HTTP errors
+are raised as urllib.error.HTTPError to keep the callers' error handling
+unchanged.
+"""
+import os
+import io
+import ssl
+import json
+import threading
+import http.client
+from urllib import error, parse
+
+MAX_IDLE_PER_HOST = 16
+
+# Errors that mean a reused keep-alive connection was closed by the server
+# before it answered; the request was never processed and can be resent.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+_ssl_lock = threading.Lock()
+_ssl_context = None
+_clients_lock = threading.Lock()
+_clients = {}
+
+
+def ssl_context():
+    global _ssl_context
+    with _ssl_lock:
+        if _ssl_context is None:
+            allow_insecure = os.environ.get("ALLOW_INSECURE_SSL", "false").lower() == "true"
+            _ssl_context = ssl._create_unverified_context() if allow_insecure else ssl.create_default_context()
+        return _ssl_context
+
+
+class RestResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def getcode(self):
+        return self.status
+
+    def json(self):
+        if not self.body:
+            return None
+        return json.loads(self.body.decode("utf-8"))
+
+
+class ConnectionPool:
+    """Idle keep-alive connections for one scheme/host/port, checked out per request."""
+
+    def __init__(self, scheme, host, port, max_idle=MAX_IDLE_PER_HOST):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is not None:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+        if self.scheme == "https":
+            conn = http.client.HTTPSConnection(self.host, self.port, timeout=timeout, context=ssl_context())
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        return conn, False
+
+    def release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class RestClient:
+    def __init__(self, base_url, apikey, service_key):
+        self.base_url = base_url.rstrip("/")
+        self.apikey = apikey or service_key
+        self.service_key = service_key
+        u = parse.urlsplit(self.base_url)
+        self.scheme = u.scheme or "https"
+        self.prefix = u.path.rstrip("/")
+        port = u.port or (443 if self.scheme == "https" else 80)
+        self.pool = ConnectionPool(self.scheme, u.hostname, port)
+
+    def headers(self, prefer=None, accept="application/json", content_type=None):
+        h = {
+            "Accept": accept,
+            # apikey can be anon or service; Authorization must be service
+            "apikey": self.apikey,
+            "Authorization": f"Bearer {self.service_key}",
+        }
+        if content_type:
+            h["Content-Type"] = content_type
+        if prefer:
+            h["Prefer"] = prefer
+        return h
+
+    def url(self, path):
+        return f"{self.base_url}/rest/v1/{path.lstrip('/')}"
+
+    def request(self, method, path, body=None, headers=None, timeout=60):
+        """Send `method` to /rest/v1/<path>. Returns RestResponse, raises HTTPError on >= 400."""
+        target = f"{self.prefix}/rest/v1/{path.lstrip('/')}"
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+        hdrs = dict(headers if headers is not None else self.headers())
+        while True:
+            conn, reused = self.pool.acquire(timeout)
+            try:
+                conn.request(method, target, body=body, headers=hdrs)
+                resp = conn.getresponse()
+                data = resp.read()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self.pool.release(conn)
+            break
+        if resp.status >= 400:
+            raise error.HTTPError(self.url(path), resp.status, resp.reason, resp.headers, io.BytesIO(data))
+        return RestResponse(resp.status, resp.headers, data)
+
+    def get_json(self, path, params=None, prefer=None, timeout=60):
+        if params:
+            path = f"{path}?{parse.urlencode(params, doseq=True)}"
+        return self.request("GET", path, headers=self.headers(prefer=prefer), timeout=timeout).json()
+
+    def close(self):
+        self.pool.close()
+
+
+def get_client(base_url, apikey, service_key):
+    """Return the process-wide client for these credentials, creating it on first use."""
+    key = (base_url.rstrip("/"), apikey or service_key, service_key)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = RestClient(base_url, apikey, service_key)
+            _clients[key] = client
+        return client
@@ -0,0 +1,148 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'services', 'timesfm-service'))
+
+import app  # noqa: E402
+import hierarchy  # noqa: E402
+
+
+class TestModelCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = app.ModelCache(max_entries=2, ttl_seconds=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)  # "b" is now least recent
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+        stats = cache.stats()
+        self.assertEqual((stats["size"], stats["evictions"]), (2, 1))
+        self.assertEqual((stats["hits"], stats["misses"]), (3, 1))
+
+    def test_entries_expire_after_ttl(self):
+        cache = app.ModelCache(max_entries=4, ttl_seconds=10)
+        with mock.patch.object(app.time, "monotonic", return_value=100.0):
+            cache.put("a", 1)
+        with mock.patch.object(app.time, "monotonic", return_value=110.0):
+            self.assertEqual(cache.get("a"), 1)
+        with mock.patch.object(app.time, "monotonic", return_value=110.5):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_put_refreshes_entry(self):
+        cache = app.ModelCache(max_entries=4, ttl_seconds=10)
+        with mock.patch.object(app.time, "monotonic", return_value=100.0):
+            cache.put("a", 1)
+        with mock.patch.object(app.time, "monotonic", return_value=105.0):
+            cache.put("a", 2)
+        with mock.patch.object(app.time, "monotonic", return_value=114.0):
+            self.assertEqual(cache.get("a"), 2)
+
+    def test_zero_entries_disables_cache(self):
+        cache = app.ModelCache(max_entries=0)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+
+class TestDecodeSeries(unittest.TestCase):
+    def test_points_keep_utc_offset_and_sort(self):
+        item = app.SeriesInput(series=[
+            {"timestamp": "2024-01-03T00:00:00+05:30", "value": 3},
+            {"timestamp": "2024-01-01T00:00:00+05:30", "value": 1},
+            {"timestamp": "2024-01-02T00:00:00+05:30", "value": 2},
+            {"timestamp": "2024-01-04T00:00:00+05:30", "value": 4},
+            {"timestamp": "2024-01-05T00:00:00+05:30", "value": 5},
+        ])
+        ds, y, freq = app.decode_series(item)
+        self.assertIsNotNone(ds.tz)
+        self.assertEqual(ds[0].utcoffset().total_seconds(), 5.5 * 3600)
+        self.assertTrue(ds.is_monotonic_increasing)
+        np.testing.assert_array_equal(y, [1, 2, 3, 4, 5])
+        self.assertIsNone(freq)
+
+    def test_columnar_timestamps_and_values(self):
+        item = app.SeriesInput(
+            timestamps=["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"],
+            values=[1, 2, 3, 4, 5],
+        )
+        ds, y, _ = app.decode_series(item)
+        self.assertIsNone(ds.tz)
+        self.assertEqual(str(ds[-1].date()), "2024-01-05")
+        self.assertEqual(y.dtype, np.float64)
+
+    def test_bare_values_with_start_and_freq(self):
+        item = app.SeriesInput(series=[1, 2, 3, 4, 5, 6], start="2024-01-31", freq="ME")
+        ds, y, freq = app.decode_series(item)
+        self.assertEqual(len(ds), 6)
+        self.assertEqual(str(ds[1].date()), "2024-02-29")
+        self.assertEqual(freq, "ME")
+
+    def test_values_without_timestamps_end_today(self):
+        ds, _, _ = app.decode_series(app.SeriesInput(values=[1, 2, 3, 4, 5]))
+        self.assertEqual(ds[-1], pd.Timestamp.today().normalize())
+
+    def test_rejects_bad_input(self):
+        with self.assertRaises(app.InvalidSeries):
+            app.decode_series(app.SeriesInput(values=[1, 2]))
+        with self.assertRaises(app.InvalidSeries):
+            app.decode_series(app.SeriesInput(timestamps=["2024-01-01"] * 4, values=[1, 2, 3, 4, 5]))
+        with self.assertRaises(app.InvalidSeries):
+            app.decode_series(app.SeriesInput(timestamps=["not a date"] * 5, values=[1, 2, 3, 4, 5]))
+
+
+class TestReconcile(unittest.TestCase):
+    PATHS = [("a", "x"), ("a", "y"), ("b", "x")]
+
+    def setUp(self):
+        self.nodes, self.S, self.bottom_rows = hierarchy.summing_matrix(self.PATHS)
+
+    def assert_coherent(self, y_all):
+        # Every node equals the sum of the bottom series beneath it
+        np.testing.assert_allclose(y_all, self.S @ y_all[self.bottom_rows])
+
+    def test_summing_matrix(self):
+        self.assertEqual(self.nodes, [(), ("a",), ("b",), ("a", "x"), ("a", "y"), ("b", "x")])
+        np.testing.assert_array_equal(self.S[0], [1, 1, 1])
+        np.testing.assert_array_equal(self.S[1], [1, 1, 0])
+        np.testing.assert_array_equal(self.bottom_rows, [3, 4, 5])
+        with self.assertRaises(ValueError):
+            hierarchy.summing_matrix([("a", "x"), ("b",)])
+        with self.assertRaises(ValueError):
+            hierarchy.summing_matrix([("a",), ("a",)])
+
+    def test_bottom_up_sums_bottom_forecasts(self):
+        bottom = np.array([[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]])
+        y_all = hierarchy.reconcile(self.S, bottom)
+        np.testing.assert_allclose(y_all[0], [9.0, 12.0])
+        self.assert_coherent(y_all)
+        # Full-node input: only the bottom rows are used
+        noisy = self.S @ bottom + 1.0
+        noisy[self.bottom_rows] = bottom
+        np.testing.assert_allclose(hierarchy.reconcile(self.S, noisy, bottom_rows=self.bottom_rows), y_all)
+
+    def test_projections_are_coherent(self):
+        rng = np.random.default_rng(0)
+        base = rng.normal(10, 3, size=(len(self.nodes), 4))
+        for method in ("ols", "wls_struct"):
+            with self.subTest(method=method):
+                self.assert_coherent(hierarchy.reconcile(self.S, base, method))
+
+    def test_projections_keep_coherent_input(self):
+        coherent = self.S @ np.array([[1.0], [2.0], [4.0]])
+        for method in ("ols", "wls_struct"):
+            with self.subTest(method=method):
+                np.testing.assert_allclose(hierarchy.reconcile(self.S, coherent, method), coherent)
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            hierarchy.reconcile(self.S, np.zeros((len(self.nodes), 1)), "mint_shrink")
+
+
+if __name__ == '__main__':
+    unittest.main()
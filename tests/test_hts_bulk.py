@@ -0,0 +1,62 @@
+import os
+import sys
+import hashlib
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from hts_bulk import content_hash, hash_sql  # noqa: E402
+
+# Optional: a scratch Postgres database for the SQL-side checks
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+SAMPLES = [
+    ('Live horses', 'NO', None, ''),
+    ('Café, "crème" & naïve', 'KG', 'X', '0101.21'),
+    (None, None, None, None),
+    ('', '', '', ''),
+    ('tab\tand\nnewline', '\\N', 'NULL', ' padded '),
+]
+
+
+class TestContentHash(unittest.TestCase):
+    def test_known_value(self):
+        expected = hashlib.md5('a\x1f\x1e\x1fc'.encode('utf-8')).hexdigest()
+        self.assertEqual(content_hash(['a', None, 'c']), expected)
+
+    def test_null_and_empty_string_differ(self):
+        self.assertNotEqual(content_hash([None]), content_hash(['']))
+        self.assertNotEqual(content_hash(['a', None]), content_hash(['a', '']))
+
+    def test_column_boundaries_matter(self):
+        self.assertNotEqual(content_hash(['ab', 'c']), content_hash(['a', 'bc']))
+
+    def test_hash_sql_covers_columns_in_order(self):
+        sql = hash_sql(('description', 'uom1'))
+        self.assertEqual(
+            sql,
+            "md5(concat_ws(chr(31), coalesce(description::text, chr(30)), coalesce(uom1::text, chr(30))))",
+        )
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, 'TEST_DATABASE_URL not set')
+class TestHashSqlMatchesPostgres(unittest.TestCase):
+    def test_same_hash_in_python_and_sql(self):
+        import psycopg2
+
+        columns = ('c1', 'c2', 'c3', 'c4')
+        conn = psycopg2.connect(TEST_DATABASE_URL)
+        self.addCleanup(conn.close)
+        with conn.cursor() as cur:
+            cur.execute("CREATE TEMP TABLE hash_check (n int, c1 text, c2 varchar(10), c3 text, c4 text)")
+            cur.executemany(
+                "INSERT INTO hash_check VALUES (%s, %s, %s, %s, %s)",
+                [(n,) + values for n, values in enumerate(SAMPLES)],
+            )
+            cur.execute(f"SELECT {hash_sql(columns)} FROM hash_check ORDER BY n")
+            self.assertEqual([h for (h,) in cur.fetchall()], [content_hash(v) for v in SAMPLES])
+        conn.rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()
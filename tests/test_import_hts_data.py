@@ -0,0 +1,65 @@
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from import_hts_data import UPSERT_COLUMNS, clean_hts_codes, latest_rows, valid_hts_codes  # noqa: E402
+
+
+class TestValidHtsCodes(unittest.TestCase):
+    def check(self, raw):
+        return valid_hts_codes(clean_hts_codes(pd.Series(raw, dtype=object))).tolist()
+
+    def test_accepts_dotted_levels(self):
+        self.assertEqual(self.check(['0101', '0101.21', '0101.21.00', '0101.21.00.10']), [True] * 4)
+
+    def test_trims_whitespace_and_keeps_leading_zeros(self):
+        self.assertEqual(clean_hts_codes(pd.Series([' 0101.21 '])).tolist(), ['0101.21'])
+        self.assertEqual(self.check([' 0101.21 ']), [True])
+
+    def test_rejects_malformed_and_missing(self):
+        self.assertEqual(
+            self.check(['101', '0101.2', '0101.21.00.10.99', '010121', '0101.ab', '', None, float('nan')]),
+            [False] * 8,
+        )
+
+    def test_result_is_plain_bool(self):
+        result = valid_hts_codes(clean_hts_codes(pd.Series(['0101', None])))
+        self.assertEqual(result.dtype, bool)
+
+
+class TestLatestRows(unittest.TestCase):
+    def test_last_row_wins(self):
+        df = pd.DataFrame(
+            {
+                'hts_code': ['0101.21', '0102.29', '0101.21'],
+                'description': ['old', 'cattle', 'new'],
+                'category': ['Chapter 01'] * 3,
+            },
+            index=pd.RangeIndex(1, 4),
+        )
+        rows, duplicates = latest_rows(df)
+        self.assertEqual(duplicates, 1)
+        self.assertEqual([pos for pos, _ in rows], [2, 3])
+        by_code = {values[0]: values for _, values in rows}
+        self.assertEqual(by_code['0101.21'][UPSERT_COLUMNS.index('description')], 'new')
+
+    def test_values_follow_upsert_columns_with_nulls(self):
+        df = pd.DataFrame(
+            {'category': ['Chapter 01'], 'hts_code': ['0101'], 'description': [float('nan')]},
+            index=pd.RangeIndex(1, 2),
+        )
+        rows, duplicates = latest_rows(df)
+        self.assertEqual(duplicates, 0)
+        (pos, values), = rows
+        self.assertEqual(pos, 1)
+        self.assertEqual(len(values), len(UPSERT_COLUMNS))
+        self.assertEqual(values[:3], ('0101', None, 'Chapter 01'))
+        self.assertTrue(all(v is None for v in values[3:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+import os
+import json
+import tempfile
+import unittest
+import importlib.util
+from unittest import mock
+
+MODULE_PATH = os.path.join(os.path.dirname(__file__), '..', 'supabase', 'migration-package', 'import-rest.py')
+
+# import-rest.py is a script (hyphenated name), so load it by path
+spec = importlib.util.spec_from_file_location('import_rest', MODULE_PATH)
+import_rest = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(import_rest)
+
+
+class TestAdaptiveBatcher(unittest.TestCase):
+    def test_initial_rows_are_clamped(self):
+        batcher = import_rest.AdaptiveBatcher(20000, min_rows=10, max_rows=5000)
+        self.assertEqual(batcher.rows, 5000)
+        self.assertEqual((batcher.low, batcher.high), (5000, 5000))
+        self.assertEqual(import_rest.AdaptiveBatcher(1, min_rows=10).rows, 10)
+
+    def test_grows_when_fast_and_shrinks_when_slow(self):
+        batcher = import_rest.AdaptiveBatcher(100, target_seconds=2.0)
+        batcher.observe(100, 0, 0.5, 201)
+        self.assertEqual(batcher.rows, 150)
+        batcher.observe(150, 0, 3.0, 201)
+        self.assertEqual(batcher.rows, 105)
+        self.assertEqual((batcher.low, batcher.high), (100, 150))
+
+    def test_no_change_inside_target_band(self):
+        batcher = import_rest.AdaptiveBatcher(100, target_seconds=2.0)
+        batcher.observe(100, 0, 1.5, 201)
+        self.assertEqual(batcher.rows, 100)
+
+    def test_smaller_chunk_does_not_grow_batch(self):
+        # A short tail chunk finishing fast says nothing about larger batches
+        batcher = import_rest.AdaptiveBatcher(100, target_seconds=2.0)
+        batcher.observe(40, 0, 0.1, 201)
+        self.assertEqual(batcher.rows, 100)
+
+    def test_halves_on_server_error_and_timeout(self):
+        batcher = import_rest.AdaptiveBatcher(400)
+        batcher.observe(400, 0, 0.1, 503)
+        self.assertEqual(batcher.rows, 200)
+        batcher.observe(200, 0, 0.1, None)
+        self.assertEqual(batcher.rows, 100)
+        self.assertEqual((batcher.low, batcher.high), (100, 400))
+
+    def test_413_caps_future_growth(self):
+        batcher = import_rest.AdaptiveBatcher(1000, max_rows=5000)
+        batcher.observe(1000, 0, 0.1, 413)
+        self.assertEqual(batcher.rows, 500)
+        self.assertEqual(batcher.max_rows, 750)
+        for _ in range(5):
+            batcher.observe(batcher.rows, 0, 0.1, 201)
+        self.assertEqual(batcher.rows, 750)
+        self.assertEqual(batcher.high, 1000)
+
+    def test_next_rows_respects_csv_byte_cap(self):
+        batcher = import_rest.AdaptiveBatcher(1000, max_csv_bytes=10_000)
+        self.assertEqual(batcher.next_rows(), 1000)
+        # 100 CSV bytes per row -> at most 100 rows under a 10 kB cap
+        batcher.observe(1000, 100_000, 1.5, 201)
+        self.assertEqual(batcher.next_rows(), 100)
+
+    def test_next_rows_never_below_min(self):
+        batcher = import_rest.AdaptiveBatcher(100, min_rows=10, max_csv_bytes=100)
+        batcher.observe(100, 1_000_000, 1.5, 201)
+        self.assertEqual(batcher.next_rows(), 10)
+
+
+class StubServer:
+    """Stands in for post_rows: rows whose id is in `bad` fail with 400,
+    rows in `existing` conflict with 409, and ids in `flaky` fail once with 503."""
+
+    def __init__(self, bad=(), existing=(), flaky=()):
+        self.bad = set(bad)
+        self.existing = set(existing)
+        self.flaky = set(flaky)
+        self.calls = []
+        self.stored = []
+
+    def __call__(self, base_url, apikey, service_key, table, rows, on_conflict=None, resolution="ignore-duplicates"):
+        self.calls.append((len(rows), on_conflict, resolution))
+        ids = {r["id"] for r in rows}
+        if ids & self.flaky:
+            self.flaky -= ids
+            return False, 503, "unavailable"
+        if ids & self.bad:
+            return False, 400, "bad row"
+        if ids & self.existing:
+            return False, 409, "duplicate key"
+        self.stored.extend(rows)
+        return True, 201, None
+
+
+class TestBisectPost(unittest.TestCase):
+    def bisect(self, server, rows, **kwargs):
+        with mock.patch.object(import_rest, "post_rows", server), mock.patch.object(import_rest.time, "sleep"):
+            return import_rest.bisect_post("http://rest", "key", "key", "items", rows, batch_index=3, **kwargs)
+
+    def test_isolates_single_bad_row(self):
+        rows = [{"id": i} for i in range(500)]
+        server = StubServer(bad={137})
+        inserted, conflicts, errors = self.bisect(server, rows)
+        self.assertEqual((inserted, conflicts), (499, 0))
+        self.assertEqual([e["row_id"] for e in errors], [137])
+        self.assertEqual((errors[0]["chunk"], errors[0]["code"]), (3, 400))
+        self.assertEqual(len(server.stored), 499)
+        # O(log n) requests, not one per row
+        self.assertLess(len(server.calls), 40)
+
+    def test_collects_conflicts(self):
+        rows = [{"id": i} for i in range(64)]
+        server = StubServer(existing={5, 40})
+        found = []
+        inserted, conflicts, errors = self.bisect(server, rows, conflict_rows=found)
+        self.assertEqual((inserted, conflicts, errors), (62, 2, []))
+        self.assertEqual(sorted(r["id"] for r in found), [5, 40])
+
+    def test_all_conflicts_cost_about_n_requests(self):
+        rows = [{"id": i} for i in range(1000)]
+        server = StubServer(existing=range(1000))
+        inserted, conflicts, errors = self.bisect(server, rows)
+        self.assertEqual((inserted, conflicts, errors), (0, 1000, []))
+        self.assertLess(len(server.calls), 1100)
+
+    def test_passes_on_conflict_and_resolution(self):
+        server = StubServer(bad={1})
+        self.bisect(server, [{"id": 0}, {"id": 1}], on_conflict="id", resolution="merge-duplicates")
+        self.assertEqual({c[1:] for c in server.calls}, {("id", "merge-duplicates")})
+
+    def test_transient_failure_is_retried_not_reported(self):
+        rows = [{"id": i} for i in range(8)]
+        server = StubServer(flaky={2})
+        inserted, conflicts, errors = self.bisect(server, rows)
+        self.assertEqual((inserted, conflicts, errors), (8, 0, []))
+
+
+class TestCheckpointResume(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.csv_path = os.path.join(self.tmp.name, "items.csv")
+        with open(self.csv_path, "w", encoding="utf-8", newline="") as f:
+            f.write('id,name\n1,"caf\u00e9"\n2,"two\nlines"\n3,three\n4,four\n')
+        self.journal_path = os.path.join(self.tmp.name, "journal.jsonl")
+
+    def rows(self, start_offset=0):
+        return list(import_rest.iter_csv_rows(self.csv_path, start_offset))
+
+    def test_offsets_are_byte_positions_past_each_record(self):
+        rows = self.rows()
+        self.assertEqual([r["id"] for r, _ in rows], ["1", "2", "3", "4"])
+        self.assertEqual(rows[1][0]["name"], "two\nlines")
+        self.assertEqual(rows[-1][1], os.path.getsize(self.csv_path))
+        for (_, offset), (row, _) in zip(rows, rows[1:]):
+            self.assertEqual([r["id"] for r, _ in self.rows(offset)][0], row["id"])
+
+    def test_resume_continues_after_last_acknowledged_chunk(self):
+        rows = self.rows()
+        journal = import_rest.CheckpointJournal(self.journal_path)
+        journal.begin_table("items")
+        journal.record_chunk("items", 1, rows[1][1], {"inserted": 2})
+        journal.record_chunk("items", 2, rows[2][1], {"inserted": 1, "errors": [{"code": 400}]})
+
+        resumed = import_rest.CheckpointJournal(self.journal_path, resume=True)
+        chunk, offset = resumed.begin_table("items")
+        self.assertEqual((chunk, offset), (2, rows[2][1]))
+        self.assertEqual([r["id"] for r, _ in self.rows(offset)], ["4"])
+
+    def test_failed_chunk_stops_acknowledged_prefix(self):
+        rows = self.rows()
+        journal = import_rest.CheckpointJournal(self.journal_path)
+        journal.begin_table("items")
+        journal.record_chunk("items", 1, rows[0][1], {"inserted": 1})
+        journal.record_chunk("items", 2, rows[1][1], {"errors": [{"code": 503}]})
+        journal.record_chunk("items", 3, rows[2][1], {"inserted": 1})
+        journal.record_table("items", {"inserted": 2})
+
+        resumed = import_rest.CheckpointJournal(self.journal_path, resume=True)
+        self.assertIsNone(resumed.table_done("items"))
+        self.assertEqual(resumed.resume_point("items"), (1, rows[0][1]))
+
+    def test_torn_final_line_is_ignored(self):
+        rows = self.rows()
+        journal = import_rest.CheckpointJournal(self.journal_path)
+        journal.begin_table("items")
+        journal.record_chunk("items", 1, rows[0][1], {"inserted": 1})
+        with open(self.journal_path, "a") as f:
+            f.write(json.dumps({"table": "items", "chunk": 2, "offset": rows[1][1], "outcome": "ok"})[:20])
+
+        resumed = import_rest.CheckpointJournal(self.journal_path, resume=True)
+        self.assertEqual(resumed.resume_point("items"), (1, rows[0][1]))
+
+
+if __name__ == '__main__':
+    unittest.main()